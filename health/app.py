@@ -100,24 +100,31 @@ def server(input, output, session: Session):
     def _():
         info_modal()
 
-    plot.plot_server("plot")
-    graph.graph_server("graph")
-    topic.topic_server("topic")
+    # Tabs are only hidden with CSS, so each module waits until its tab has
+    # been opened once before loading its datasets and rendering
+    opened = {tab: reactive.value(False) for tab in ("plot", "graph", "topic")}
+
+    plot.plot_server("plot", opened=opened["plot"])
+    graph.graph_server("graph", opened=opened["graph"])
+    topic.topic_server("topic", opened=opened["topic"])
 
     @reactive.Effect
     @reactive.event(input.tab_funding)
     async def _():
+        opened["plot"].set(True)
         await session.send_custom_message("toggleActiveTab", {"activeTab": "plot"})
 
     @reactive.Effect
     @reactive.event(input.tab_graph)
     async def _():
+        opened["graph"].set(True)
         await session.send_custom_message("toggleActiveTab", {"activeTab": "graph"})
 
 
     @reactive.Effect
     @reactive.event(input.tab_topic)
     async def _():
+        opened["topic"].set(True)
         await session.send_custom_message("toggleActiveTab", {"activeTab": "topic"})
 
 
@@ -1,5 +1,134 @@
+import hashlib
+import logging
 import os
+import threading
+import time
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Feature modules (and their dependencies) are imported inside the loader
+# that needs them, so importing the registry stays cheap.
+
+logger = logging.getLogger(__name__)
+
+# Bump when a schema or a normalization step changes so stale caches are rebuilt
+SCHEMA_VERSION = "3"
+
+# The organisation tables only keep the columns the graph module uses;
+# repeated strings are dictionary-encoded and IDs fit in int32.
+ORGS_DTYPES = {
+    "projectID": "int32",
+    "organisationID": "int32",
+    "name": "category",
+    "activityType": "category",
+    "country": "category",
+    "country_name": "category",
+    "role": "string",
+}
+
+
+def validate_columns(df, columns, name):
+    """Raise if a table is missing columns the app depends on"""
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        raise ValueError(f"{name} is missing required columns: {missing}")
+
+
+def parse_decimal(values):
+    """Parse numbers written with a decimal comma, e.g. '595182,5'"""
+    return pd.to_numeric(values.str.replace(",", ".", regex=False), errors="coerce").astype("float64")
+
+
+def normalize_fund_data(fund_df):
+    """Add the derived country name and averaged GDP/HLY columns"""
+    validate_columns(fund_df, ["TIME", "TotalFundsPerCountry"], "fund data")
+    fund_df["country_name"] = fund_df["TIME"]
+    fund_df["GDPM2124"] = fund_df[["GDP2021", "GDP2022", "GDP2023", "GDP2024"]].mean(axis=1)
+
+    fund_df["HLYM2122"] = fund_df[["HLY2021", "HLY2022"]].mean(axis=1)
+    return fund_df
+
+
+def normalize_topic_data(topic_df):
+    """
+    Turn the raw topic export into clean numeric, datetime and categorical
+    columns plus the signature year, so chart builders only group.
+    """
+    validate_columns(
+        topic_df,
+        ["topic", "topic_label", "ecSignatureDate", "ecMaxContribution", "publication_count"],
+        "topic data",
+    )
+    topic_df["ecMaxContribution"] = parse_decimal(topic_df["ecMaxContribution"])
+    topic_df["totalCost"] = parse_decimal(topic_df["totalCost"])
+    topic_df["ecSignatureDate"] = pd.to_datetime(topic_df["ecSignatureDate"], errors="coerce")
+    topic_df["year"] = topic_df["ecSignatureDate"].dt.year.astype("Int16")
+    topic_df["topic_label"] = topic_df["topic_label"].astype("category")
+    return topic_df
+
+
+def normalize_orgs_data(orgs_df):
+    """Lower-case and dictionary-encode roles, count missing publications as 0"""
+    validate_columns(orgs_df, ["projectID", "name", "country_name", "role"], "organisation data")
+    orgs_df["role"] = orgs_df["role"].str.lower().astype("category")
+    if "publicationCount" in orgs_df.columns:
+        orgs_df["publicationCount"] = orgs_df["publicationCount"].fillna(0).astype("int32")
+    return orgs_df
+
+
+# Explicit schemas for every table the app reads. Only the listed columns are
+# parsed from the CSV, so index columns left over from the notebooks are dropped.
+SCHEMAS = {
+    "fund": {
+        "filename": "FundsGDPhealth_export.csv",
+        "dtype": {
+            "country": "string",
+            "TotalFundsPerCountry": "float64",
+            "TIME": "string",
+            **{f"GDP{year}": "float64" for year in range(2013, 2025)},
+            "GDPM2124": "float64",
+            **{f"HLY{year}": "float64" for year in range(2011, 2023)},
+            "HLY1922": "float64",
+            "HLY2122": "float64",
+        },
+        "parse_dates": [],
+        "normalize": normalize_fund_data,
+    },
+    "topic": {
+        "filename": "topic_df.csv",
+        "dtype": {
+            "projectID": "int64",
+            "title": "string",
+            "abstract": "string",
+            "topic": "int64",
+            "euroSciVocTitle": "string",
+            "totalCost": "string",
+            "ecMaxContribution": "string",
+            "topic_label": "string",
+            "MMR": "string",
+            "KeyBERT": "string",
+            "POS": "string",
+            "Count": "int64",
+            "publication_count": "float64",
+        },
+        "parse_dates": ["ecSignatureDate"],
+        "normalize": normalize_topic_data,
+    },
+    "orgs": {
+        "filename": "health_orgs.csv",
+        "dtype": ORGS_DTYPES,
+        "parse_dates": [],
+        "normalize": normalize_orgs_data,
+    },
+    "orgs_pub": {
+        "filename": "health_orgs_pub.csv",
+        "dtype": {**ORGS_DTYPES, "publicationCount": "float64"},
+        "parse_dates": [],
+        "normalize": normalize_orgs_data,
+    },
+}
 
 
 def get_data_dir():
@@ -14,46 +143,325 @@ def get_data_path(filename):
     return os.path.join(get_data_dir(), filename)
 
 
-def load_fund_data():
-    """Load topic data from CSV file"""
-    # Path to the real data file
-    data_path = get_data_path("FundsGDPhealth_export.csv")
+def get_model_dir():
+    """Get the absolute path to the saved BERTopic model artefacts."""
+    return get_data_path("model_dir")
 
-    # Read the CSV file
-    fund_df = pd.read_csv(data_path)
-    fund_df["country_name"] = fund_df["TIME"]
-    fund_df["GDPM2124"] = fund_df[["GDP2021", "GDP2022", "GDP2023", "GDP2024"]].mean(axis=1)
 
-    fund_df["HLYM2122"] = fund_df[["HLY2021", "HLY2022"]].mean(axis=1)
-    return fund_df
+def get_cache_dir():
+    """Get the absolute path to the columnar cache directory."""
+    if os.environ.get("HEALTH_APP_CACHE_DIR"):
+        return os.environ.get("HEALTH_APP_CACHE_DIR")
+    return os.path.join(get_data_dir(), "cache")
 
 
-plot_data = load_fund_data()
+def dataset_version(filename):
+    """Short fingerprint of a source file and the current schema version"""
+    stat = os.stat(get_data_path(filename))
+    key = f"{filename}:{stat.st_size}:{stat.st_mtime_ns}:{SCHEMA_VERSION}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
 
-def load_topic_data():
-    """Load topic data from CSV file"""
-    # Path to the real data file
-    data_path = get_data_path("topic_df.csv")
 
-    # Read the CSV file
-    topic_df = pd.read_csv(data_path)
-    return topic_df
+def read_csv_with_schema(name):
+    """Parse a source CSV with its declared schema and normalize it"""
+    schema = SCHEMAS[name]
+    df = pd.read_csv(
+        get_data_path(schema["filename"]),
+        usecols=list(schema["dtype"]) + schema["parse_dates"],
+        dtype=schema["dtype"],
+        parse_dates=schema["parse_dates"],
+    )
+    if schema["normalize"] is not None:
+        df = schema["normalize"](df)
+    return df
 
 
-topic_data = load_topic_data()
+def cached_version(path):
+    """Return the dataset version stored in an Arrow file, if any"""
+    if not os.path.exists(path):
+        return None
+    with pa.memory_map(path) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    version = metadata.get(b"dataset_version")
+    return version.decode("utf-8") if version else None
 
 
-def load_orgs_data():
-    data_path = get_data_path("health_orgs.csv")
-    orgs_df = pd.read_csv(data_path)
-    return orgs_df
+def write_arrow(df, path, version):
+    """Atomically write a DataFrame as an uncompressed Arrow IPC file"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), b"dataset_version": version.encode("utf-8")}
+    table = table.replace_schema_metadata(metadata)
 
-orgs_data = load_orgs_data()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
 
 
-def load_orgs_pub_data():
-    data_path = get_data_path("health_orgs_pub.csv")
-    orgs_df = pd.read_csv(data_path)
-    return orgs_df
+def shared_mode():
+    """
+    True when workers should only attach to Arrow files published by a
+    loader process (see publish_datasets) and never write the cache.
+    """
+    return os.environ.get("HEALTH_APP_SHARED_DATA", "").lower() in ("1", "true", "yes")
+
+
+# Strings stay Arrow-backed so they point into the memory map instead of
+# being copied into per-process Python objects
+ARROW_STRING_TYPES = {
+    pa.string(): pd.StringDtype("pyarrow"),
+    pa.large_string(): pd.StringDtype("pyarrow"),
+}
+
+
+def read_arrow(path, columns=None):
+    """
+    Memory-map an Arrow file into a read-only DataFrame. Numeric columns
+    without nulls and string columns are zero-copy views on the mapped
+    pages, so every worker reading the same file shares the OS page cache.
+    """
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True, types_mapper=ARROW_STRING_TYPES.get)
+
+
+def cached_frame(name, version, build, columns=None):
+    """
+    Return the Arrow-cached frame `name` at `version`, calling `build` and
+    writing the cache when it is missing or stale. In shared mode a stale
+    cache is rebuilt in memory only, leaving the file to the loader process.
+    The frame is tagged with attrs["dataset_version"] for downstream caches.
+    """
+    arrow_path = os.path.join(get_cache_dir(), f"{name}.arrow")
+    df = None
+
+    if cached_version(arrow_path) != version:
+        df = build()
+        if shared_mode():
+            logger.warning("No published cache for %s, building it in this worker", name)
+        else:
+            try:
+                write_arrow(df, arrow_path, version)
+                df = None
+            except OSError:
+                # Read-only deployments fall back to the in-memory frame
+                pass
+
+    if df is None:
+        df = read_arrow(arrow_path, columns=columns)
+    elif columns is not None:
+        df = df[columns]
+    # Same tags as utils.cache_utils.tag_frame, which derived frames fail to match
+    df.attrs["dataset_version"] = f"{name}@{version}"
+    df.attrs["dataset_signature"] = (tuple(df.columns), df.shape)
+    return df
+
+
+def read_table(name, columns=None):
+    """
+    Read a table from the columnar cache, rebuilding and normalizing it from
+    CSV when the source file changed. Reads are memory-mapped and only the
+    requested columns are materialized.
+    """
+    schema = SCHEMAS[name]
+    return cached_frame(
+        name,
+        dataset_version(schema["filename"]),
+        lambda: read_csv_with_schema(name),
+        columns=columns,
+    )
+
+
+def load_fund_data(columns=None):
+    """Load funding, GDP and HLY data per country"""
+    return read_table("fund", columns=columns)
+
+
+def load_topic_data(columns=None):
+    """Load topic data from the columnar store"""
+    return read_table("topic", columns=columns)
+
+
+def load_topic_cube():
+    """Load the (topic, year) aggregate cube behind the Topic tab charts"""
+    from utils.topic_utils import build_topic_cube
+
+    return cached_frame(
+        "topic_cube",
+        dataset_version(SCHEMAS["topic"]["filename"]),
+        lambda: build_topic_cube(get_dataset("topic")),
+    )
+
+
+def load_datamap():
+    """Build the spatial index of the 2D document map"""
+    from utils.ctfidf_utils import load_topic_info
+    from utils.datamap_utils import build_datamap_index
+    from utils.embedding_utils import open_store, read_rows
+
+    coords = read_rows(open_store(get_data_path("2comp_embeddings.safetensors")))
+    info = load_topic_info(get_model_dir())
+
+    titles = None
+    try:
+        titles = load_topic_data(columns=["title"])["title"].tolist()
+    except FileNotFoundError:
+        pass
+    if titles is not None and len(titles) != len(coords):
+        titles = None
+
+    return build_datamap_index(coords, info["topics"], info["labels"], titles=titles)
+
+
+def load_project_neighbors():
+    """KD-tree over the 5D project embeddings plus the project rows it indexes"""
+    from utils.ctfidf_utils import load_topic_info
+    from utils.neighbors_utils import load_neighbor_index
+
+    tree = load_neighbor_index(
+        get_data_path("5comp_embeddings.safetensors"),
+        persist=not shared_mode(),
+    )
+    info = load_topic_info(get_model_dir())
+    titles = load_topic_data(columns=["title"])["title"]
+    if len(titles) != len(info["topics"]) or len(titles) != tree.data.shape[0]:
+        raise ValueError(
+            f"Project neighbours need one title per embedded project: {len(titles)} titles, "
+            f"{tree.data.shape[0]} embeddings, {len(info['topics'])} topic assignments"
+        )
+    projects = pd.DataFrame({
+        "title": titles.to_numpy(),
+        "topic_label": [info["labels"][topic] if topic >= 0 else "Outlier" for topic in info["topics"]],
+    })
+    return {"tree": tree, "projects": projects}
+
+
+def load_ctfidf():
+    """Load the c-TF-IDF topic classifier from the saved model artefacts"""
+    from utils.ctfidf_utils import load_ctfidf_model
+
+    return load_ctfidf_model(get_model_dir())
+
+
+def load_topic_similarity():
+    """
+    Topic x topic and topic x EuroSciVoc similarity matrices from the
+    pipeline, or None when they have not been exported yet
+    """
+    from utils.similarity_utils import load_topic_similarity as read_topic_similarity
+
+    path = get_data_path("topic_similarity.safetensors")
+    if not os.path.exists(path):
+        logger.warning("%s not found; run `python -m pipeline.run similarity export` to build it", path)
+        return None
+    return read_topic_similarity(path)
+
+
+def load_topic_hierarchy():
+    """Precomputed topic linkage behind the dendrogram"""
+    from utils.ctfidf_utils import load_topic_info
+    from utils.hierarchy_utils import load_topic_hierarchy as read_topic_hierarchy
+
+    return read_topic_hierarchy(
+        get_data_path("topic_hierarchy.safetensors"),
+        load_topic_info(get_model_dir())["labels"],
+    )
+
+
+def load_orgs_data(columns=None):
+    return read_table("orgs", columns=columns)
+
+
+def load_orgs_pub_data(columns=None):
+    return read_table("orgs_pub", columns=columns)
+
+
+def load_project_years():
+    """Signature year of every project, for time-sliced collaboration networks"""
+    return load_topic_data(columns=["projectID", "year"])
+
+
+# Datasets are loaded on first access through get_dataset() instead of at
+# import time, so a worker only pays for the tables its sessions touch.
+DATASETS = {
+    "fund": load_fund_data,
+    "topic": load_topic_data,
+    "topic_cube": load_topic_cube,
+    "datamap": load_datamap,
+    "ctfidf": load_ctfidf,
+    "project_neighbors": load_project_neighbors,
+    "topic_similarity": load_topic_similarity,
+    "topic_hierarchy": load_topic_hierarchy,
+    "orgs": load_orgs_data,
+    "orgs_pub": load_orgs_pub_data,
+    "project_years": load_project_years,
+}
+
+_loaded = {}
+_timings = {}
+_memory = {}
+_load_locks = {}
+_registry_lock = threading.Lock()
+
+
+def register_dataset(name, loader):
+    """Register a loader that get_dataset() calls on first access"""
+    with _registry_lock:
+        DATASETS[name] = loader
+
+
+def get_dataset(name):
+    """
+    Return a dataset, loading it on first access. Concurrent first accesses
+    wait on a per-dataset lock so every table is loaded exactly once.
+    """
+    if name in _loaded:
+        return _loaded[name]
+
+    with _registry_lock:
+        if name not in DATASETS:
+            raise KeyError(f"Unknown dataset: {name}")
+        lock = _load_locks.setdefault(name, threading.Lock())
+
+    with lock:
+        if name not in _loaded:
+            start = time.perf_counter()
+            _loaded[name] = DATASETS[name]()
+            _timings[name] = time.perf_counter() - start
+            if isinstance(_loaded[name], pd.DataFrame):
+                _memory[name] = int(_loaded[name].memory_usage(deep=True).sum())
+            logger.info(
+                "Loaded dataset %s in %.3fs (%.1f MB)",
+                name, _timings[name], _memory.get(name, 0) / 1e6,
+            )
+    return _loaded[name]
+
+
+def dataset_timings():
+    """Load time in seconds of every dataset loaded so far"""
+    return dict(_timings)
+
+
+def dataset_memory():
+    """In-memory size in bytes of every table loaded so far"""
+    return dict(_memory)
+
+
+def publish_datasets():
+    """
+    Build the Arrow cache of every columnar table in this process. Run it
+    once before starting several workers that attach read-only:
+
+        python data.py
+        HEALTH_APP_SHARED_DATA=1 uvicorn app:app --workers 4
+    """
+    for name in [*SCHEMAS, "topic_cube"]:
+        try:
+            get_dataset(name)
+        except (OSError, ValueError):
+            logger.exception("Could not publish dataset %s", name)
+    return dataset_timings()
+
 
-orgs_pub_data = load_orgs_pub_data()
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    publish_datasets()
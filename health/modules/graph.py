@@ -4,14 +4,29 @@ from utils.helper_text import (
     missing_note
 )
 
-from shiny import ui, render, reactive, module
+from shiny import ui, render, reactive, module, req
 from shinywidgets import (
     output_widget,
     render_widget,
 )
-from utils.graph_utils import build_country_network, create_network_plot, create_trendline_plot
-from data import orgs_data, orgs_pub_data
-import pandas as pd
+from utils.graph_utils import (
+    country_year_timeline,
+    create_network_plot,
+    create_trendline_plot,
+    window_edge_table,
+)
+from utils.org_network_utils import (
+    METRIC_COLUMNS,
+    create_ego_network_plot,
+    ego_network,
+    org_choices,
+    org_metrics_future,
+    org_metrics_table,
+    org_network,
+    organisation_directory,
+)
+from data import get_dataset
+import asyncio
 
 @module.ui
 def graph_ui():
@@ -26,7 +41,13 @@ def graph_ui():
         ),
         ui.tags.div(
             ui.tags.h4("EU Health Research Collaboration Network"),
-            ui.output_plot("network_plot", height="1000px", width="100%"),
+            ui.tags.div(
+                ui.output_ui("year_range_control"),
+                ui.input_numeric("min_weight", "Minimum shared projects per link:", value=5, min=1),
+                ui.input_checkbox("show_labels", "Show country names", value=True),
+                class_="table-container"
+            ),
+            output_widget("network_plot"),
             ui.tags.hr(),
             ui.tags.div(
                 ui.tags.h4("Top Country Collaborations"),
@@ -35,6 +56,27 @@ def graph_ui():
                 class_="table-container"
             ),
             ui.tags.hr(),
+            ui.tags.div(
+                ui.tags.h4("Organisation Collaboration Network"),
+                ui.input_selectize(
+                    "org_search",
+                    "Search for an organisation:",
+                    choices=[],
+                    width="100%",
+                ),
+                ui.input_numeric("ego_neighbors", "Maximum collaborators to display:", value=25, min=5, max=100),
+                output_widget("ego_network_plot"),
+                ui.tags.h4("Most Central Organisations"),
+                ui.input_select(
+                    "org_metric",
+                    "Rank organisations by:",
+                    choices={metric: label for metric, label in METRIC_COLUMNS.items()},
+                ),
+                ui.input_numeric("top_org_n", "Number of organisations to display:", value=10, min=5, max=50),
+                ui.output_table("org_centrality_table"),
+                class_="table-container"
+            ),
+            ui.tags.hr(),
             ui.tags.div(
                 ui.tags.h4("Top Project Coordinators"),
                 ui.input_numeric("top_n", "Number of top coordinators to display:", value=10, min=5, max=50),
@@ -50,78 +92,132 @@ def graph_ui():
     )
 
 @module.server
-def graph_server(input, output, session):
+def graph_server(input, output, session, opened):
     """Server function for network graph visualization"""
     
     @reactive.Calc
     def data():
-        return orgs_data
+        req(opened())
+        return get_dataset("orgs")
     
     @reactive.Calc
     def pub_data():
-        return orgs_pub_data
+        req(opened())
+        return get_dataset("orgs_pub")
     
     @reactive.Calc
-    def generate_network():
-        """Build the network based on current settings"""
-        min_weight = 5
-        G, _ = build_country_network(data(), min_weight=min_weight)
-        return G
+    def year_timeline():
+        """Per-year pair weights and prefix sums, computed once per dataset version"""
+        return country_year_timeline(data(), get_dataset("project_years"))
     
-    @render.plot
-    def network_plot():
-        """Render the network visualization"""
-        G = generate_network()
-        fig = create_network_plot(G)
-        return fig
+    @render.ui
+    def year_range_control():
+        """Year-range slider spanning the signature years present in the data"""
+        timeline = year_timeline()
+        years = timeline["years"]
+        req(len(years))
+        first, last = int(years[0]), int(years[-1])
+        slider = ui.input_slider(
+            "year_range",
+            "Signature years:",
+            min=first,
+            max=last,
+            value=(first, last),
+            step=1,
+            sep="",
+            animate=ui.AnimationOptions(interval=1500, loop=False),
+            width="100%",
+        )
+        if not timeline["undated"]:
+            return slider
+        return ui.TagList(
+            slider,
+            ui.tags.p(ui.tags.small(
+                f"{timeline['undated']} multi-country projects without a signature year "
+                "are not counted in the network or the table."
+            )),
+        )
+    
+    @reactive.Calc
+    def collaboration_edges():
+        """Country pairs by number of shared projects signed in the selected years"""
+        timeline = year_timeline()
+        year_range = input.year_range()
+        if year_range is None:
+            years = timeline["years"]
+            req(len(years))
+            year_range = (years[0], years[-1])
+        return window_edge_table(timeline, *year_range)
+    
+    @reactive.Calc
+    def network_figure():
+        """The network for the current settings, shared across sessions through the figure cache"""
+        min_weight = input.min_weight()
+        req(min_weight is not None and min_weight >= 1)
+        return create_network_plot(
+            collaboration_edges(),
+            min_weight=int(min_weight),
+            show_labels=input.show_labels(),
+        )
     
     @reactive.Calc
     def country_collaboration_data():
-        """Generate data for country collaboration table"""
-        from itertools import combinations
-        from collections import Counter
-        
-        health_orgs = data()
-        country_edges = []
-
-        for pid, group in health_orgs.groupby('projectID'):
-            countries = group['country_name'].dropna().unique()
-            if len(countries) >= 2:
-                for pair in combinations(sorted(countries), 2):
-                    country_edges.append(pair)
-
-        edge_counts = Counter(country_edges)
-
-        edge_df = pd.DataFrame(edge_counts.items(), columns=['Country Pair', 'Num Projects'])
-        edge_df = edge_df.sort_values(by='Num Projects', ascending=False)
-
-        edge_df[['Country A', 'Country B']] = pd.DataFrame(edge_df['Country Pair'].tolist(), index=edge_df.index)
-        edge_df.drop(columns='Country Pair', inplace=True)
-        
-        # Reorder columns: Country A, Country B, Number of Projects
-        edge_df = edge_df[['Country A', 'Country B', 'Num Projects']]
-        edge_df.columns = ['Country A', 'Country B', 'Number of Projects']  # Rename for consistency
-        
-        # Get top N country pairs
-        top_country_n = input.top_country_n()
-        return edge_df.head(top_country_n)
-        
+        """Top N country pairs, a slice of the shared edge table"""
+        top_n = input.top_country_n()
+        req(top_n is not None and top_n >= 1)
+        return collaboration_edges().head(int(top_n))
 
+    @reactive.Calc
+    def org_directory():
+        return organisation_directory(data())
+    
+    @reactive.Effect
+    @reactive.event(opened)
+    def _():
+        req(opened())
+        ui.update_selectize("org_search", choices=org_choices(org_directory()), server=True)
+        org_metrics_task(data())
+    
+    @reactive.extended_task
+    async def org_metrics_task(orgs):
+        """Centralities from the shared background job for this dataset version"""
+        return await asyncio.wrap_future(org_metrics_future(orgs))
+    
+    @reactive.Calc
+    def ego_network_figure():
+        req(input.org_search())
+        max_neighbors = input.ego_neighbors()
+        req(max_neighbors is not None and max_neighbors >= 1)
+        org_id = int(input.org_search())
+        G = ego_network(org_network(data()), org_id, max_neighbors=int(max_neighbors))
+        return create_ego_network_plot(G, org_id, org_directory())
+    
+    @reactive.Calc
+    def org_metrics_data():
+        """Top organisations by the selected centrality, once the background job is done"""
+        top_n = input.top_org_n()
+        req(top_n is not None and top_n >= 1)
+        return org_metrics_table(
+            org_metrics_task.result(),
+            org_directory(),
+            rank_by=input.org_metric(),
+            top_n=int(top_n),
+        )
+    
     @reactive.Calc
     def coordination_analysis_data():
         """Generate data for coordination vs publications analysis"""
         # Filter for coordinator records from publication data
-        health_coordinators = pub_data()[pub_data()['role'].str.lower() == 'coordinator']
-        
-        # Frequency of coordination
-        coord_freq = health_coordinators['name'].value_counts().reset_index()
-        coord_freq.columns = ['name', 'coord_count']
+        health_coordinators = pub_data()[pub_data()['role'] == 'coordinator']
         
-        # Publication counts merged
-        pubs_per_org = health_coordinators.groupby('name')['publicationCount'].sum().reset_index()
-        
-        # Merge both
-        combined = pd.merge(coord_freq, pubs_per_org, on='name')
+        # Frequency of coordination and publication counts per institution
+        combined = (
+            health_coordinators
+                .groupby('name', observed=True)
+                .agg(coord_count=('projectID', 'size'), publicationCount=('publicationCount', 'sum'))
+                .reset_index()
+                .sort_values(by='coord_count', ascending=False)
+        )
         combined.columns = ['Institution', 'Coordinated Projects', 'Total Publications']
         
         return combined
@@ -147,13 +243,13 @@ def graph_server(input, output, session):
     def top_coordinators_data():
         """Generate data for top coordinators table"""
         # Filter for coordinator records
-        health_coordinators = data()[data()['role'].str.lower() == 'coordinator']
+        health_coordinators = data()[data()['role'] == 'coordinator']
         
         # Count projects per coordinator and get top N
         top_n = input.top_n()
         coordinator_counts = (
             health_coordinators
-                .groupby(['name', 'country_name'])
+                .groupby(['name', 'country_name'], observed=True)
                 .size()
                 .reset_index(name='num_coordinated_projects')
                 .sort_values(by='num_coordinated_projects', ascending=False)
@@ -170,11 +266,26 @@ def graph_server(input, output, session):
         return country_collaboration_data()
 
 
+    @render.table
+    def org_centrality_table():
+        """Render the organisation centrality table"""
+        return org_metrics_data()
+
+
     @render.table
     def coordinators_table():
         """Render the top coordinators table"""
         return top_coordinators_data()
     
+    @render_widget
+    def network_plot():
+        """Render the network visualization"""
+        return network_figure()
+    
+    @render_widget
+    def ego_network_plot():
+        return ego_network_figure()
+    
     @render_widget
     def orgs_pub_plot():
         return trendline_plot()
\ No newline at end of file
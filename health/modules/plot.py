@@ -1,4 +1,4 @@
-from shiny import module, reactive, ui
+from shiny import module, reactive, req, ui
 from shinywidgets import (
     output_widget,
     render_widget,
@@ -11,9 +11,7 @@ from utils.helper_text import (
 )
 from utils.plot_utils import create_funds_bar_chart, create_scatter_plot
 
-from data import plot_data
-
-country_choices = plot_data["country_name"].unique().tolist()
+from data import get_dataset
 
 
 @module.ui
@@ -27,8 +25,8 @@ def plot_ui():
             ui.input_selectize(
                 id="country_select",
                 label="Select Countries:",
-                choices=country_choices,
-                selected=country_choices,
+                choices=[],
+                selected=[],
                 multiple=True,
             ),
             ui.tags.hr(),
@@ -54,10 +52,18 @@ def plot_ui():
 
 
 @module.server
-def plot_server(input, output, session):
+def plot_server(input, output, session, opened):
     @reactive.Calc
     def data():
-        return plot_data
+        req(opened())
+        return get_dataset("fund")
+
+    @reactive.Effect
+    @reactive.event(opened)
+    def _():
+        req(opened())
+        country_choices = data()["country_name"].unique().tolist()
+        ui.update_selectize("country_select", choices=country_choices, selected=country_choices)
 
     @reactive.Calc
     def fig_one():
@@ -1,4 +1,4 @@
-from shiny import module, reactive, ui
+from shiny import module, reactive, render, req, ui
 from shinywidgets import (
     output_widget,
     render_widget,
@@ -8,12 +8,14 @@ from utils.helper_text import (
     dataset_information,
     missing_note
 )
-from utils.topic_utils import create_topic_trend, create_topic_total_funding, create_topic_avg_funding, create_topic_total_publication, create_topic_avg_publication, create_static_topic_map
+from utils.topic_utils import create_topic_trend, create_topic_total_funding, create_topic_avg_funding, create_topic_total_publication, create_topic_avg_publication, create_topic_kwords
+from utils.ctfidf_utils import classify_texts
+from utils.neighbors_utils import query_similar
+from utils.datamap_utils import create_topic_datamap
+from utils.hierarchy_utils import create_topic_dendrogram, group_choices, topic_groups
+from utils.similarity_utils import closest_fields, create_topic_similarity_heatmap
 
-from data import topic_data
-import os
-
-topic_choices = topic_data["topic_label"].unique().tolist()
+from data import get_dataset
 
 
 @module.ui
@@ -26,9 +28,9 @@ def topic_ui():
             ui.input_selectize(
                 id="topic_select",
                 label="Select Topics:",
-                choices=topic_choices,
+                choices=[],
                 multiple=True,
-                selected=topic_choices
+                selected=[]
             ),
             ui.tags.br(),
             ui.tags.hr(),
@@ -39,7 +41,53 @@ def topic_ui():
         ),
         ui.tags.div(
             ui.tags.h4("Topic Document Datamap"),
-            output_widget("topic_static_map"),
+            output_widget("topic_datamap"),
+            ui.tags.hr(),
+            ui.tags.h4("Top Keywords by Topic"),
+            output_widget("topic_kwords_plot"),
+            ui.tags.hr(),
+            ui.tags.h4("Topic Hierarchy"),
+            ui.input_slider("hierarchy_groups", "Number of branches:", min=2, max=23, value=6, step=1),
+            ui.input_select(
+                "topic_branch",
+                "Filter charts by branch:",
+                choices={"": "All topics"},
+                width="100%",
+            ),
+            output_widget("topic_dendrogram"),
+            ui.tags.hr(),
+            ui.tags.h4("Topic Similarity"),
+            output_widget("topic_similarity_plot"),
+            ui.tags.div(
+                ui.output_table("topic_fields_table"),
+                class_="table-container"
+            ),
+            ui.tags.hr(),
+            ui.tags.div(
+                ui.tags.h4("Find Topics for a Text"),
+                ui.input_text_area(
+                    "topic_query",
+                    "Paste keywords, a title or an abstract:",
+                    placeholder="e.g. mRNA vaccine against malaria",
+                    width="100%",
+                ),
+                ui.output_table("topic_query_table"),
+                class_="table-container"
+            ),
+            ui.tags.hr(),
+            ui.tags.div(
+                ui.tags.h4("Similar Projects"),
+                ui.input_selectize(
+                    "similar_to",
+                    "Find projects similar to:",
+                    choices=[],
+                    multiple=True,
+                    width="100%",
+                ),
+                ui.input_numeric("similar_n", "Number of similar projects to display:", value=10, min=1, max=50),
+                ui.output_table("similar_table"),
+                class_="table-container"
+            ),
             ui.tags.hr(),
             ui.tags.h4("Topic Trend over time"),
             output_widget("topic_trend_plot"),
@@ -62,16 +110,31 @@ def topic_ui():
 
 
 @module.server
-def topic_server(input, output, session):
+def topic_server(input, output, session, opened):
     @reactive.Calc
     def data():
-        return topic_data
+        req(opened())
+        return get_dataset("topic_cube")
+
+    @reactive.Effect
+    @reactive.event(opened)
+    def _():
+        req(opened())
+        topic_choices = data()["topic_label"].unique().tolist()
+        ui.update_selectize("topic_select", choices=topic_choices, selected=topic_choices)
+        ui.update_slider("hierarchy_groups", max=len(get_dataset("topic_hierarchy")["labels"]))
+
+        projects = get_dataset("project_neighbors")["projects"]
+        ui.update_selectize(
+            "similar_to",
+            choices={str(row): title for row, title in enumerate(projects["title"])},
+            server=True,
+        )
     
     @reactive.Calc
-    def fig_static_topic_map():
-        app_dir = os.path.dirname(os.path.dirname(__file__))
-        image_path = os.path.join(app_dir, "www", "static", "img", "doc_map.png")
-        return create_static_topic_map(image_path)
+    def fig_topic_datamap():
+        req(opened())
+        return create_topic_datamap(get_dataset("datamap"))
     
     @reactive.Calc
     def fig_one():
@@ -79,7 +142,7 @@ def topic_server(input, output, session):
             data=data(),
             topic=input.topic_select(),
             title="",
-            labels={"time_period": "Year", "count": "Project Count"},
+            labels={"year": "Year", "count": "Project Count"},
         )
     
     @reactive.Calc
@@ -120,9 +183,108 @@ def topic_server(input, output, session):
             labels={"publication_count": "Total Publications", "topic": "Topic",}
         )
 
+    @reactive.Calc
+    def fig_kwords():
+        req(opened())
+        return create_topic_kwords(
+            model=get_dataset("ctfidf"),
+            topic=input.topic_select(),
+            title="",
+        )
+
+    @reactive.Effect
+    @reactive.event(opened, input.hierarchy_groups)
+    def _():
+        req(opened())
+        choices = group_choices(get_dataset("topic_hierarchy"), input.hierarchy_groups())
+        ui.update_select("topic_branch", choices={"": "All topics", **choices}, selected="")
+
+    @reactive.Effect
+    @reactive.event(input.topic_branch)
+    def _():
+        """Selecting a branch restricts every chart to the topics in that subtree"""
+        req(opened())
+        hierarchy = get_dataset("topic_hierarchy")
+        if input.topic_branch():
+            topics = topic_groups(hierarchy, input.hierarchy_groups())[int(input.topic_branch())]
+            selected = [hierarchy["labels"][topic] for topic in topics]
+        else:
+            selected = data()["topic_label"].unique().tolist()
+        ui.update_selectize("topic_select", selected=selected)
+
+    @reactive.Calc
+    def fig_dendrogram():
+        req(opened())
+        return create_topic_dendrogram(get_dataset("topic_hierarchy"), n_groups=input.hierarchy_groups())
+
+    @reactive.Calc
+    def fig_similarity():
+        req(opened())
+        return create_topic_similarity_heatmap(
+            similarity=get_dataset("topic_similarity"),
+            topic=input.topic_select(),
+            title="",
+        )
+
+    @reactive.Calc
+    def topic_fields_data():
+        """How well each topic matches the EuroSciVoc fields of its projects"""
+        req(opened())
+        return closest_fields(get_dataset("topic_similarity"), input.topic_select()).round({"Alignment": 2})
+
+    @reactive.Calc
+    def topic_query_data():
+        """Score the query text against every topic's c-TF-IDF vector"""
+        req(opened(), input.topic_query().strip())
+        matches = classify_texts(get_dataset("ctfidf"), [input.topic_query()], top_k=5)
+        matches = matches[matches["score"] > 0][["topic_label", "score"]]
+        matches.columns = ["Topic", "Similarity"]
+        return matches
+
+    @reactive.Calc
+    def similar_projects_data():
+        """Nearest neighbours of the chosen projects in the 5D embedding space"""
+        req(opened(), input.similar_to())
+        n_similar = input.similar_n()
+        req(n_similar is not None and 1 <= n_similar <= 50)
+        neighbors = get_dataset("project_neighbors")
+        similar = query_similar(
+            neighbors["tree"],
+            [int(row) for row in input.similar_to()],
+            k=int(n_similar),
+        )
+        similar = similar.join(neighbors["projects"], on="row")
+        similar = similar[["title", "topic_label", "distance"]]
+        similar.columns = ["Project", "Topic", "Distance"]
+        return similar
+
+    @render.table
+    def similar_table():
+        return similar_projects_data()
+
+    @render_widget
+    def topic_kwords_plot():
+        return fig_kwords()
+
+    @render_widget
+    def topic_dendrogram():
+        return fig_dendrogram()
+
+    @render_widget
+    def topic_similarity_plot():
+        return fig_similarity()
+
+    @render.table
+    def topic_fields_table():
+        return topic_fields_data()
+
+    @render.table
+    def topic_query_table():
+        return topic_query_data()
+
     @render_widget
-    def topic_static_map():
-        return fig_static_topic_map()
+    def topic_datamap():
+        return fig_topic_datamap()
 
     @render_widget
     def topic_trend_plot():
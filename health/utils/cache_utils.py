@@ -0,0 +1,261 @@
+import inspect
+import logging
+import os
+import pickle
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from plotly.basedatatypes import BaseFigure
+
+logger = logging.getLogger(__name__)
+
+# Process-wide bounds, shared by every cached builder of each kind
+MAX_ENTRIES = int(os.environ.get("HEALTH_APP_FIGURE_CACHE_ENTRIES", 256))
+MAX_BYTES = int(os.environ.get("HEALTH_APP_FIGURE_CACHE_MB", 128)) * 1024 * 1024
+DATA_MAX_ENTRIES = int(os.environ.get("HEALTH_APP_DATA_CACHE_ENTRIES", 64))
+DATA_MAX_BYTES = int(os.environ.get("HEALTH_APP_DATA_CACHE_MB", 256)) * 1024 * 1024
+
+
+class BoundedCache:
+    """Thread-safe LRU bounded by entry count and estimated bytes"""
+
+    def __init__(self, name, max_entries, max_bytes):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "uncacheable": 0, "oversize": 0}
+        self.lock = threading.Lock()
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, frozen, size):
+        if size > self.max_bytes:
+            self.count("oversize")
+            logger.warning(
+                "Not caching %s in the %s cache: ~%.1f MB exceeds the %.1f MB bound",
+                key[1], self.name, size / 1e6, self.max_bytes / 1e6,
+            )
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (frozen, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.stats["evictions"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, "entries": len(self.entries), "bytes": self.bytes}
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+_figures = BoundedCache("figure", MAX_ENTRIES, MAX_BYTES)
+_data = BoundedCache("data", DATA_MAX_ENTRIES, DATA_MAX_BYTES)
+
+
+# Content hashes of untagged frames, so a frame is hashed once per object
+_frame_hashes = {}
+_frame_hashes_lock = threading.Lock()
+
+
+class Uncacheable(Exception):
+    """Raised when an argument cannot be turned into a stable cache key"""
+
+
+def tag_frame(df: DataFrame, version: str) -> DataFrame:
+    """Mark `df` as the complete frame of a dataset version"""
+    df.attrs["dataset_version"] = version
+    df.attrs["dataset_signature"] = (tuple(df.columns), df.shape)
+    return df
+
+
+def frame_version(df: DataFrame):
+    """
+    The dataset version of a tagged frame. Pandas copies attrs onto
+    projections and filters, so a frame whose columns or shape differ from
+    the tagged ones is derived and has no version (None).
+    """
+    version = df.attrs.get("dataset_version")
+    if version is None or df.attrs.get("dataset_signature") != (tuple(df.columns), df.shape):
+        return None
+    return version
+
+
+def content_hash(df: DataFrame) -> int:
+    """Hash of the frame's values, computed once per frame object"""
+    with _frame_hashes_lock:
+        entry = _frame_hashes.get(id(df))
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+
+    digest = int(pd.util.hash_pandas_object(df, index=False).sum())
+    frame_id = id(df)
+    with _frame_hashes_lock:
+        _frame_hashes[frame_id] = (weakref.ref(df), digest)
+    weakref.finalize(df, _forget_frame, frame_id)
+    return digest
+
+
+def _forget_frame(frame_id):
+    with _frame_hashes_lock:
+        _frame_hashes.pop(frame_id, None)
+
+
+def normalize_arg(value, selection=False):
+    """
+    Turn a builder argument into a hashable key part. DataFrames are keyed
+    by their dataset version (or a content hash when untagged or derived)
+    and their columns; selection arguments by the set of selected values,
+    so order does not matter. Frames passed to cached builders must not be
+    mutated afterwards.
+    """
+    if isinstance(value, DataFrame):
+        version = frame_version(value)
+        if version is None:
+            version = content_hash(value)
+        return ("DataFrame", version, tuple(value.columns), value.shape)
+    if selection:
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return frozenset(value)
+        return frozenset([value])
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_arg(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, normalize_arg(item)) for key, item in value.items()))
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise Uncacheable(type(value).__name__)
+
+
+def freeze(value):
+    """Store figures as plain dicts so every hit gets its own widget"""
+    if isinstance(value, BaseFigure):
+        return (type(value), value.to_dict())
+    return (None, value)
+
+
+def thaw(frozen):
+    figure_type, value = frozen
+    if figure_type is not None:
+        return figure_type(value)
+    return value
+
+
+def estimate_size(value, sample=64) -> int:
+    """
+    Approximate in-memory size of a cached result without serializing it.
+    Arrays, frames and sparse matrices report their buffers; long lists are
+    extrapolated from their first `sample` items; anything else is pickled.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (DataFrame, pd.Series, pd.Index)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if hasattr(value, "indptr") or hasattr(value, "row"):
+        # scipy.sparse CSR/CSC or COO
+        parts = ("data", "indices", "indptr") if hasattr(value, "indptr") else ("data", "row", "col")
+        return sum(getattr(value, part).nbytes for part in parts)
+    if value is None or isinstance(value, (bool, int, float, str, bytes, type)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(key, sample) + estimate_size(item, sample) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return sys.getsizeof(value)
+        head = value[:sample]
+        return sys.getsizeof(value) + sum(estimate_size(item, sample) for item in head) * len(value) // len(head)
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def cached(cache: BoundedCache, selection=()):
+    """Memoize a builder in `cache`, keyed by the builder and its normalized arguments"""
+    if isinstance(selection, str):
+        selection = (selection,)
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            try:
+                key = (func.__module__, func.__qualname__) + tuple(
+                    (name, normalize_arg(value, selection=name in selection))
+                    for name, value in bound.arguments.items()
+                )
+                hash(key)
+            except (Uncacheable, TypeError):
+                cache.count("uncacheable")
+                return func(*args, **kwargs)
+
+            frozen = cache.get(key)
+            if frozen is not None:
+                return thaw(frozen)
+
+            value = func(*args, **kwargs)
+            frozen = freeze(value)
+            cache.put(key, frozen, estimate_size(frozen[1]))
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def figure_cache(selection=()):
+    """
+    Cache a figure builder across sessions, keyed by the builder, the
+    normalized selection and the dataset version of its data. Entries are
+    evicted least-recently-used once the entry or memory bound is hit.
+    """
+    return cached(_figures, selection)
+
+
+def data_cache(selection=()):
+    """
+    Cache an intermediate result (edge tables, matrices, lookups) across
+    sessions, in a store bounded separately from the figures. Results are
+    shared and must not be mutated.
+    """
+    return cached(_data, selection)
+
+
+def cache_stats():
+    """Hit/miss/eviction/oversize counters and the current size of each cache"""
+    return {"figure": _figures.snapshot(), "data": _data.snapshot()}
+
+
+def clear_cache():
+    _figures.clear()
+    _data.clear()
@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+from pandas import DataFrame
+from safetensors.numpy import load_file
+from scipy.sparse import csr_matrix, diags
+
+# Lightweight inference on the saved BERTopic artefacts (model_dir) without
+# importing bertopic or torch. sklearn is only imported when the vectorizer
+# was fitted with its built-in "english" stop-word list.
+
+
+def load_topic_info(model_dir: str) -> dict:
+    """Load per-document topic assignments, labels and keywords from topics.json"""
+    with open(os.path.join(model_dir, "topics.json"), encoding="utf-8") as f:
+        info = json.load(f)
+    labels = info["custom_labels"] or [info["topic_labels"][key] for key in sorted(info["topic_labels"], key=int)]
+    # Labels are stored outliers first when the model kept a -1 topic
+    return {
+        "topics": info["topics"],
+        "outliers": info["_outliers"],
+        "labels": labels[info["_outliers"]:],
+        "topic_sizes": {int(topic): size for topic, size in info["topic_sizes"].items()},
+        "representations": {int(topic): words for topic, words in info["topic_representations"].items()},
+    }
+
+
+def l2_normalize_rows(matrix: csr_matrix) -> csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return diags(1.0 / norms) @ matrix
+
+
+def stop_word_set(stop_words) -> frozenset:
+    """The fitted vectorizer's stop words: None, "english" (sklearn's list) or an explicit list"""
+    if stop_words is None:
+        return frozenset()
+    if stop_words == "english":
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+        return frozenset(ENGLISH_STOP_WORDS)
+    return frozenset(stop_words)
+
+
+def strip_accents(text: str, mode) -> str:
+    """CountVectorizer's strip_accents="unicode" / "ascii" """
+    if mode == "unicode":
+        return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    if mode == "ascii":
+        return unicodedata.normalize("NFKD", text).encode("ASCII", "ignore").decode("ASCII")
+    return text
+
+
+def load_ctfidf_model(model_dir: str) -> dict:
+    """
+    Load the vocabulary, the sparse topic x term c-TF-IDF matrix and the IDF
+    diagonal saved by BERTopic with serialization="safetensors".
+    """
+    tensors = load_file(os.path.join(model_dir, "ctfidf.safetensors"))
+    with open(os.path.join(model_dir, "ctfidf_config.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    params = config["vectorizer_model"]["params"]
+    info = load_topic_info(model_dir)
+
+    ctfidf = csr_matrix(
+        (tensors["data"], tensors["indices"], tensors["indptr"]),
+        shape=tuple(tensors["shape"]),
+    )
+    return {
+        "ctfidf": ctfidf,
+        "topic_matrix": l2_normalize_rows(ctfidf).T.tocsr(),
+        "idf": tensors["diag"],
+        "vocab": config["vectorizer_model"]["vocab"],
+        "token_pattern": re.compile(params["token_pattern"]),
+        "lowercase": params["lowercase"],
+        "strip_accents": params.get("strip_accents"),
+        "stop_words": stop_word_set(params.get("stop_words")),
+        "ngram_range": tuple(params["ngram_range"]),
+        "reduce_frequent_words": config["ctfidf_model"]["reduce_frequent_words"],
+        # Row i of the matrix is topic i - outliers
+        "topic_ids": np.arange(ctfidf.shape[0]) - info["outliers"],
+        "labels": info["labels"],
+        "representations": info["representations"],
+    }
+
+
+def vectorize_texts(model: dict, texts: list) -> csr_matrix:
+    """
+    Bag-of-words counts over the model vocabulary, like the fitted
+    CountVectorizer: lowercase, strip accents, tokenize, drop stop words,
+    then build n-grams from the remaining tokens.
+    """
+    vocab = model["vocab"]
+    stop_words = model["stop_words"]
+    min_n, max_n = model["ngram_range"]
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        text = text or ""
+        text = strip_accents(text.lower() if model["lowercase"] else text, model["strip_accents"])
+        tokens = [token for token in model["token_pattern"].findall(text) if token not in stop_words]
+        for n in range(min_n, max_n + 1):
+            for start in range(len(tokens) - n + 1):
+                col = vocab.get(" ".join(tokens[start:start + n]))
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+    counts = csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(len(texts), len(vocab)),
+    )
+    counts.sum_duplicates()
+    return counts
+
+
+def transform_texts(model: dict, texts: list) -> csr_matrix:
+    """c-TF-IDF weights of new documents (BERTopic's ClassTfidfTransformer.transform)"""
+    counts = vectorize_texts(model, texts)
+    totals = np.asarray(counts.sum(axis=1)).ravel()
+    totals[totals == 0] = 1.0
+    weights = diags(1.0 / totals) @ counts
+    if model["reduce_frequent_words"]:
+        weights.data = np.sqrt(weights.data)
+    return weights @ diags(model["idf"])
+
+
+def score_texts(model: dict, texts: list, batch_size: int = 1024) -> np.ndarray:
+    """Cosine similarity of every text to every topic, one sparse matmul per batch"""
+    scores = np.zeros((len(texts), model["topic_matrix"].shape[1]))
+    for start in range(0, len(texts), batch_size):
+        batch = l2_normalize_rows(transform_texts(model, texts[start:start + batch_size]))
+        scores[start:start + batch_size] = (batch @ model["topic_matrix"]).toarray()
+    return scores
+
+
+def classify_texts(model: dict, texts: list, top_k: int = 3, batch_size: int = 1024) -> DataFrame:
+    """Top-k topics for each text with their labels and similarity scores"""
+    scores = score_texts(model, texts, batch_size=batch_size)
+    top_k = min(top_k, scores.shape[1])
+    best = np.argsort(-scores, axis=1)[:, :top_k]
+
+    labels = model["labels"]
+    records = []
+    for doc, columns in enumerate(best):
+        for rank, column in enumerate(columns, start=1):
+            topic = int(model["topic_ids"][column])
+            records.append({
+                "doc": doc,
+                "rank": rank,
+                "topic": topic,
+                "topic_label": labels[topic] if topic >= 0 else "Outlier",
+                "score": scores[doc, column],
+            })
+    return DataFrame(records)
@@ -0,0 +1,199 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from pandas import DataFrame
+from pyqtree import Index
+
+OUTLIER_COLOR = "#cccccc"
+
+
+def topic_colors(n_topics: int) -> np.ndarray:
+    """One qualitative color per topic id"""
+    palette = px.colors.qualitative.Alphabet
+    return np.array([palette[topic % len(palette)] for topic in range(n_topics)])
+
+
+def build_datamap_index(coords: np.ndarray, topics: np.ndarray, labels: list, titles=None, max_level: int = 8) -> dict:
+    """
+    Build the spatial structures behind the interactive datamap: a quadtree
+    over the 2D document coordinates for viewport queries, and a pyramid of
+    density grids (2x2 up to 2^max_level cells per side) holding the count,
+    centroid and dominant topic of every non-empty cell.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    topics = np.asarray(topics, dtype=np.int64)
+    x, y = coords[:, 0], coords[:, 1]
+
+    pad = 0.01 * max(x.max() - x.min(), y.max() - y.min())
+    bounds = (x.min() - pad, y.min() - pad, x.max() + pad, y.max() + pad)
+    width, height = bounds[2] - bounds[0], bounds[3] - bounds[1]
+
+    index = Index(bbox=bounds)
+    for doc, (doc_x, doc_y) in enumerate(coords):
+        index.insert(doc, (doc_x, doc_y, doc_x, doc_y))
+
+    # Outliers (-1) are counted but never win a cell's dominant topic
+    n_topics = topics.max() + 1
+    topic_slot = np.where(topics < 0, n_topics, topics)
+
+    levels = []
+    for level in range(1, max_level + 1):
+        n = 2 ** level
+        col = np.clip(((x - bounds[0]) / width * n).astype(np.int64), 0, n - 1)
+        row = np.clip(((y - bounds[1]) / height * n).astype(np.int64), 0, n - 1)
+        cell_ids, cell = np.unique(row * n + col, return_inverse=True)
+
+        counts = np.bincount(cell)
+        per_topic = np.bincount(cell * (n_topics + 1) + topic_slot, minlength=len(cell_ids) * (n_topics + 1))
+        per_topic = per_topic.reshape(len(cell_ids), n_topics + 1)
+        dominant = per_topic[:, :n_topics].argmax(axis=1)
+        dominant[per_topic[:, :n_topics].max(axis=1) == 0] = -1
+
+        levels.append({
+            "n": n,
+            "x": np.bincount(cell, weights=x) / counts,
+            "y": np.bincount(cell, weights=y) / counts,
+            "count": counts,
+            "topic": dominant,
+        })
+
+    # Label positions: median of each topic's documents
+    label_x, label_y, label_text = [], [], []
+    for topic in range(n_topics):
+        members = topics == topic
+        if members.any():
+            label_x.append(np.median(x[members]))
+            label_y.append(np.median(y[members]))
+            label_text.append(labels[topic])
+
+    return {
+        "index": index,
+        "coords": coords,
+        "topics": topics,
+        "labels": labels,
+        "titles": titles,
+        "bounds": bounds,
+        "levels": levels,
+        "colors": topic_colors(n_topics),
+        "label_positions": (label_x, label_y, label_text),
+    }
+
+
+def query_datamap(datamap: dict, x_range=None, y_range=None, max_points: int = 2000, max_cells: int = 1500):
+    """
+    Return what to draw for a viewport. When at most `max_points` documents
+    are visible they are returned individually (via the quadtree), otherwise
+    the densest grid level with at most about `max_cells` visible cells is
+    returned as aggregated cells. Either way the payload stays bounded.
+    """
+    x0, y0, x1, y1 = datamap["bounds"]
+    if x_range is not None:
+        x0, x1 = max(min(x_range), x0), min(max(x_range), x1)
+    if y_range is not None:
+        y0, y1 = max(min(y_range), y0), min(max(y_range), y1)
+
+    full_w = datamap["bounds"][2] - datamap["bounds"][0]
+    full_h = datamap["bounds"][3] - datamap["bounds"][1]
+    visible_fraction = max(x1 - x0, 0) / full_w * max(y1 - y0, 0) / full_h
+
+    level = datamap["levels"][0]
+    for candidate in datamap["levels"]:
+        if candidate["n"] ** 2 * visible_fraction <= max_cells:
+            level = candidate
+
+    in_view = (level["x"] >= x0) & (level["x"] <= x1) & (level["y"] >= y0) & (level["y"] <= y1)
+    if level["count"][in_view].sum() <= max_points:
+        rows = np.array(sorted(datamap["index"].intersect((x0, y0, x1, y1))), dtype=np.int64)
+        points = DataFrame({
+            "x": datamap["coords"][rows, 0] if len(rows) else [],
+            "y": datamap["coords"][rows, 1] if len(rows) else [],
+            "topic": datamap["topics"][rows] if len(rows) else [],
+            "row": rows,
+        })
+        return "points", points
+
+    cells = DataFrame({
+        "x": level["x"][in_view],
+        "y": level["y"][in_view],
+        "count": level["count"][in_view],
+        "topic": level["topic"][in_view],
+    })
+    return "cells", cells
+
+
+def marker_colors(datamap: dict, topics: np.ndarray) -> list:
+    topics = np.asarray(topics, dtype=np.int64)
+    colors = np.full(len(topics), OUTLIER_COLOR, dtype=object)
+    known = topics >= 0
+    colors[known] = datamap["colors"][topics[known]]
+    return colors.tolist()
+
+
+def hover_text(datamap: dict, rows: np.ndarray) -> list:
+    labels = datamap["labels"]
+    titles = datamap["titles"]
+    text = []
+    for row in rows:
+        topic = datamap["topics"][row]
+        label = labels[topic] if topic >= 0 else "Outlier"
+        text.append(f"{titles[row]}<br>{label}" if titles is not None else label)
+    return text
+
+
+def update_datamap(fig: go.FigureWidget, datamap: dict, x_range=None, y_range=None):
+    """Redraw the cell and point traces of a datamap figure for a viewport"""
+    kind, view = query_datamap(datamap, x_range, y_range)
+    with fig.batch_update():
+        cells, points = fig.data[0], fig.data[1]
+        if kind == "cells":
+            cells.update(
+                x=view["x"], y=view["y"],
+                marker=dict(size=np.clip(np.sqrt(view["count"]) * 3, 4, 30), color=marker_colors(datamap, view["topic"])),
+                text=[f"{count} projects" for count in view["count"]],
+                visible=True,
+            )
+            points.update(x=[], y=[], text=[], visible=False)
+        else:
+            points.update(
+                x=view["x"], y=view["y"],
+                marker=dict(color=marker_colors(datamap, view["topic"])),
+                text=hover_text(datamap, view["row"].to_numpy()),
+                visible=True,
+            )
+            cells.update(x=[], y=[], text=[], visible=False)
+
+
+def create_topic_datamap(datamap: dict, width: int = 1000, height: int = 800) -> go.FigureWidget:
+    """
+    Interactive document map. Zoomed out it shows density cells colored by
+    their dominant topic; zooming in swaps in the individual projects of
+    the visible area, queried server-side on every pan/zoom.
+    """
+    label_x, label_y, label_text = datamap["label_positions"]
+    fig = go.FigureWidget(
+        data=[
+            go.Scatter(mode="markers", name="Density", hovertemplate="%{text}<extra></extra>",
+                       marker=dict(opacity=0.6, line=dict(width=0))),
+            go.Scattergl(mode="markers", name="Projects", hovertemplate="%{text}<extra></extra>",
+                         marker=dict(size=5, opacity=0.8)),
+            go.Scatter(x=label_x, y=label_y, text=label_text, mode="text", name="Topics",
+                       textfont=dict(size=11), hoverinfo="skip"),
+        ]
+    )
+    fig.update_layout(
+        width=width,
+        height=height,
+        showlegend=False,
+        plot_bgcolor="white",
+        dragmode="zoom",
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False, scaleanchor="x"),
+        margin=dict(l=10, r=10, t=10, b=10),
+    )
+    update_datamap(fig, datamap)
+
+    def on_viewport_change(layout, x_range, y_range):
+        update_datamap(fig, datamap, x_range, y_range)
+
+    fig.layout.on_change(on_viewport_change, "xaxis.range", "yaxis.range")
+    return fig
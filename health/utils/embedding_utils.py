@@ -0,0 +1,114 @@
+import json
+import os
+import struct
+
+import numpy as np
+from safetensors.numpy import save_file
+
+# Memory-mapped access to safetensors embedding files: nothing is read until
+# rows are requested, and only the pages holding those rows are touched.
+
+SAFETENSORS_DTYPES = {
+    "F64": np.float64,
+    "F32": np.float32,
+    "F16": np.float16,
+    "I64": np.int64,
+    "I32": np.int32,
+    "I8": np.int8,
+    "U8": np.uint8,
+}
+
+
+def read_header(path: str) -> tuple:
+    """The JSON header of a safetensors file and the byte offset where tensor data starts"""
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    return header, 8 + header_size
+
+
+def map_tensor(path: str, name: str, header: dict = None, offset: int = None) -> np.memmap:
+    """Read-only memory map of one tensor, without loading it"""
+    if header is None:
+        header, offset = read_header(path)
+    info = header[name]
+    if info["dtype"] not in SAFETENSORS_DTYPES:
+        raise ValueError(f"Unsupported dtype {info['dtype']} for {name} in {path}")
+    start, _ = info["data_offsets"]
+    return np.memmap(path, dtype=SAFETENSORS_DTYPES[info["dtype"]], mode="r",
+                     offset=offset + start, shape=tuple(info["shape"]))
+
+
+def open_store(paths, name: str = "embeddings") -> dict:
+    """
+    Open one or more safetensors shards holding consecutive rows of `name`.
+    int8 shards carry their own per-dimension `scales`, applied on read;
+    every read returns float32.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    shards, n_rows = [], 0
+    for path in paths:
+        header, offset = read_header(path)
+        rows = map_tensor(path, name, header, offset)
+        scales = None
+        if "scales" in header:
+            scales = np.asarray(map_tensor(path, "scales", header, offset), dtype=np.float32)
+        shards.append((n_rows, n_rows + len(rows), rows, scales))
+        n_rows += len(rows)
+    return {
+        "shards": shards,
+        "shape": (n_rows,) + shards[0][2].shape[1:],
+        "dtype": shards[0][2].dtype,
+    }
+
+
+def dequantize(rows: np.ndarray, scales: np.ndarray = None) -> np.ndarray:
+    rows = np.asarray(rows, dtype=np.float32)
+    if scales is not None:
+        rows = rows * scales
+    return rows
+
+
+def read_rows(store: dict, start: int = 0, stop: int = None) -> np.ndarray:
+    """Rows [start, stop) as float32, touching only the shards and pages that hold them"""
+    stop = store["shape"][0] if stop is None else min(stop, store["shape"][0])
+    parts = []
+    for shard_start, shard_stop, rows, scales in store["shards"]:
+        if shard_start < stop and start < shard_stop:
+            part = rows[max(start, shard_start) - shard_start:min(stop, shard_stop) - shard_start]
+            parts.append(dequantize(part, scales))
+    if not parts:
+        return np.empty((0,) + store["shape"][1:], dtype=np.float32)
+    return np.concatenate(parts)
+
+
+def gather_rows(store: dict, indices) -> np.ndarray:
+    """Arbitrary rows as float32, in the order of `indices`"""
+    indices = np.asarray(indices, dtype=np.int64)
+    result = np.empty((len(indices),) + store["shape"][1:], dtype=np.float32)
+    for shard_start, shard_stop, rows, scales in store["shards"]:
+        in_shard = np.flatnonzero((indices >= shard_start) & (indices < shard_stop))
+        if len(in_shard):
+            result[in_shard] = dequantize(rows[indices[in_shard] - shard_start], scales)
+    return result
+
+
+def quantize(embeddings: np.ndarray, dtype: str = "float32") -> dict:
+    """Tensors to store for `embeddings`: float32, float16, or int8 with per-dimension scales"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if dtype in ("float32", "float16"):
+        return {"embeddings": np.ascontiguousarray(embeddings, dtype=dtype)}
+    if dtype == "int8":
+        scales = np.abs(embeddings).max(axis=0) / 127
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(embeddings / scales), -127, 127).astype(np.int8)
+        return {"embeddings": codes, "scales": scales.astype(np.float32)}
+    raise ValueError(f"Unsupported storage dtype: {dtype}")
+
+
+def write_store(path: str, embeddings: np.ndarray, dtype: str = "float32"):
+    """Write embeddings (optionally quantized) as a safetensors file load_file can still read"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    save_file(quantize(embeddings, dtype), tmp_path, metadata={"storage_dtype": dtype})
+    os.replace(tmp_path, path)
@@ -1,15 +1,14 @@
 import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
-from itertools import combinations
-from collections import Counter
 from pandas import DataFrame
+from scipy.sparse import csr_matrix, triu
 from sklearn.linear_model import LinearRegression
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 
+from utils.cache_utils import data_cache, figure_cache, frame_version, tag_frame
+
 
 
 # Geographic positions for European countries
@@ -55,82 +54,214 @@ geo_pos = {
 }
 
 
-def build_country_network(data: DataFrame, min_weight=5):
+def incidence_matrix(rows: pd.Series, cols: pd.Series):
     """
-    Build a network graph of country collaborations based on project data
+    Sparse 0/1 matrix with one row per distinct value of `rows` and one
+    column per distinct value of `cols` (sorted), set where they co-occur.
+    Missing values are dropped and repeated pairs count once.
     """
-    country_edges = []
+    keep = rows.notna().to_numpy() & cols.notna().to_numpy()
+    row_codes, row_values = pd.factorize(rows[keep], sort=True)
+    col_codes, col_values = pd.factorize(cols[keep], sort=True)
+    matrix = csr_matrix(
+        (np.ones(len(row_codes), dtype=np.int32), (row_codes, col_codes)),
+        shape=(len(row_values), len(col_values)),
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix, np.asarray(col_values)
 
-    # Create edges between countries collaborating on the same project
-    for pid, group in data.groupby('projectID'):
-        countries = group['country_name'].dropna().unique()
-        if len(countries) >= 2:
-            for pair in combinations(sorted(countries), 2):
-                country_edges.append(pair)
 
-    edge_counts = Counter(country_edges)
-    
-    # Create graph with minimum weight threshold
-    G = nx.Graph()
-    for (c1, c2), weight in edge_counts.items():
-        if weight >= min_weight:
-            G.add_edge(c1, c2, weight=weight)
-            
-    return G, edge_counts
+@data_cache()
+def country_cooccurrence(data: DataFrame) -> dict:
+    """
+    Number of shared projects for every pair of countries, from a single
+    B^T B product over the project x country incidence matrix B. Pairs are
+    returned once (alphabetical order within a pair), heaviest first.
+    """
+    incidence, countries = incidence_matrix(data["projectID"], data["country_name"].astype(object))
+    pairs = triu(incidence.T @ incidence, k=1).tocoo()
+    order = np.lexsort((pairs.col, pairs.row, -pairs.data))
+    return {
+        "countries": countries,
+        "source": pairs.row[order],
+        "target": pairs.col[order],
+        "weight": pairs.data[order],
+    }
 
-def create_network_plot(G, show_labels=True, figsize=(14, 12)):
+
+@data_cache()
+def country_edge_table(data: DataFrame) -> DataFrame:
     """
-    Create network visualization with geographic positioning
+    One row per collaborating country pair, heaviest first. Top-N tables and
+    thresholded networks are slices of it.
     """
-    # Calculate node properties
-    node_degrees = dict(G.degree())
-    node_sizes = [node_degrees[node] * 100 for node in G.nodes()]
-    
-    # Color mapping based on node degrees
-    norm = colors.Normalize(vmin=min(node_degrees.values()), vmax=max(node_degrees.values()))
-    cmap = plt.colormaps['viridis']
-    node_colors = [cmap(norm(node_degrees[node])) for node in G.nodes()]
-    
-    # Create figure
-    fig, ax = plt.subplots(figsize=figsize)
-    
-    # Draw nodes
-    nodes = nx.draw_networkx_nodes(
-        G, geo_pos, ax=ax,
-        node_size=node_sizes,
-        node_color=node_colors,
-        edgecolors='black'
+    cooccurrence = country_cooccurrence(data)
+    countries = cooccurrence["countries"]
+    edges = DataFrame({
+        "Country A": countries[cooccurrence["source"]],
+        "Country B": countries[cooccurrence["target"]],
+        "Number of Projects": cooccurrence["weight"].astype(np.int64),
+    })
+    if frame_version(data) is not None:
+        tag_frame(edges, f"country_edges:{frame_version(data)}")
+    return edges
+
+
+@data_cache()
+def country_year_timeline(data: DataFrame, project_years: DataFrame) -> dict:
+    """
+    Shared projects per country pair and signature year, with prefix sums
+    over the years, so any [start, end] window is one array difference.
+    Pairs are those of country_cooccurrence. Projects without a known
+    signature year are in no window; `undated` is how many of them have
+    partners in two or more countries.
+    """
+    cooccurrence = country_cooccurrence(data)
+    countries = cooccurrence["countries"]
+    pair_keys = cooccurrence["source"].astype(np.int64) * len(countries) + cooccurrence["target"]
+    key_order = np.argsort(pair_keys)
+
+    years_by_project = project_years.dropna(subset=["year"]).drop_duplicates("projectID").set_index("projectID")["year"]
+    project_year = data["projectID"].map(years_by_project).to_numpy(dtype=np.float64, na_value=np.nan)
+    country_codes = pd.Categorical(data["country_name"].astype(object), categories=countries).codes
+    project_codes, project_values = pd.factorize(data["projectID"])
+    valid = (country_codes >= 0) & (project_codes >= 0)
+    known = valid & ~np.isnan(project_year)
+    years = np.unique(project_year[known]).astype(np.int64)
+
+    undated = valid & np.isnan(project_year)
+    undated_incidence = csr_matrix(
+        (np.ones(undated.sum(), dtype=np.int32), (project_codes[undated], country_codes[undated])),
+        shape=(len(project_values), len(countries)),
     )
-    
-    # Draw edges
-    nx.draw_networkx_edges(
-        G, geo_pos, ax=ax,
-        width=[G[u][v]['weight'] * 0.3 for u, v in G.edges()],
-        edge_color='gray',
-        alpha=0.6
+    undated_incidence.sum_duplicates()
+    undated_incidence.data[:] = 1
+
+    weights = np.zeros((len(years), len(pair_keys)), dtype=np.int64)
+    for row, year in enumerate(years):
+        in_year = known & (project_year == year)
+        incidence = csr_matrix(
+            (np.ones(in_year.sum(), dtype=np.int32), (project_codes[in_year], country_codes[in_year])),
+            shape=(len(project_values), len(countries)),
+        )
+        incidence.sum_duplicates()
+        incidence.data[:] = 1
+        pairs = triu(incidence.T @ incidence, k=1).tocoo()
+        keys = pairs.row.astype(np.int64) * len(countries) + pairs.col
+        weights[row, key_order[np.searchsorted(pair_keys, keys, sorter=key_order)]] = pairs.data
+
+    timeline = {
+        **cooccurrence,
+        "years": years,
+        "prefix": np.vstack([np.zeros((1, len(pair_keys)), dtype=np.int64), np.cumsum(weights, axis=0)]),
+        "undated": int((np.diff(undated_incidence.indptr) >= 2).sum()),
+    }
+    if frame_version(data) is not None and frame_version(project_years) is not None:
+        timeline["version"] = f"{frame_version(data)}+{frame_version(project_years)}"
+    return timeline
+
+
+def window_edge_table(timeline: dict, start: int, end: int) -> DataFrame:
+    """
+    The edge table (as country_edge_table) for projects signed from `start`
+    to `end` inclusive, from two rows of the prefix sums.
+    """
+    years, prefix = timeline["years"], timeline["prefix"]
+    weights = prefix[np.searchsorted(years, end, side="right")] - prefix[np.searchsorted(years, start, side="left")]
+    pairs = np.flatnonzero(weights > 0)
+    pairs = pairs[np.lexsort((timeline["target"][pairs], timeline["source"][pairs], -weights[pairs]))]
+    countries = timeline["countries"]
+    edges = DataFrame({
+        "Country A": countries[timeline["source"][pairs]],
+        "Country B": countries[timeline["target"][pairs]],
+        "Number of Projects": weights[pairs],
+    })
+    if "version" in timeline:
+        tag_frame(edges, f"country_edges:{timeline['version']}:{start}-{end}")
+    return edges
+
+
+def country_network(edges: DataFrame, min_weight=5):
+    """Graph of the country pairs in a weight-sorted edge table with at least `min_weight` projects"""
+    weights = edges["Number of Projects"].to_numpy()
+    # Weights are sorted descending, so the kept edges are a prefix
+    kept = edges.iloc[:int(np.searchsorted(-weights, -min_weight, side="right"))]
+    G = nx.Graph()
+    G.add_weighted_edges_from(
+        zip(kept["Country A"], kept["Country B"], kept["Number of Projects"].tolist())
+    )
+    return G
+
+
+@figure_cache()
+def create_network_plot(edges: DataFrame, min_weight=5, show_labels=True) -> go.Figure:
+    """
+    Network visualization with geographic positioning, drawn client-side.
+    Cached per (edge table version, min_weight, show_labels), so every
+    session gets the same prebuilt spec instead of rendering its own image.
+    """
+    G = country_network(edges, min_weight)
+    nodes = [node for node in G.nodes() if node in geo_pos]
+    fig = go.Figure()
+    if not nodes:
+        fig.update_layout(title="No country pairs reach this number of shared projects")
+        return fig
+
+    # Edge widths scale with weight; plotly needs one trace per width, so
+    # the weights are binned into a few width levels
+    weights = np.array([G[u][v]["weight"] for u, v in G.edges()])
+    levels = np.ceil(weights / weights.max() * 8).astype(int) if len(weights) else weights
+    for level in np.unique(levels):
+        edge_x, edge_y = [], []
+        for (u, v), edge_level in zip(G.edges(), levels):
+            if edge_level == level and u in geo_pos and v in geo_pos:
+                edge_x += [geo_pos[u][0], geo_pos[v][0], None]
+                edge_y += [geo_pos[u][1], geo_pos[v][1], None]
+        fig.add_trace(go.Scattergl(
+            x=edge_x, y=edge_y, mode="lines",
+            line=dict(color="rgba(128, 128, 128, 0.6)", width=float(level)),
+            hoverinfo="skip", showlegend=False,
+        ))
+
+    # Node size and color based on degree
+    degrees = [G.degree(node) for node in nodes]
+    fig.add_trace(go.Scattergl(
+        x=[geo_pos[node][0] for node in nodes],
+        y=[geo_pos[node][1] for node in nodes],
+        mode="markers+text" if show_labels else "markers",
+        text=nodes if show_labels else None,
+        textposition="top center",
+        textfont=dict(size=11, color="black"),
+        marker=dict(
+            size=[10 + 2 * degree for degree in degrees],
+            color=degrees,
+            colorscale="Viridis",
+            line=dict(color="black", width=1),
+            colorbar=dict(title="Number of Collaborating Countries"),
+        ),
+        customdata=degrees,
+        hovertext=nodes,
+        hovertemplate="%{hovertext}<br>Collaborating countries: %{customdata}<extra></extra>",
+        showlegend=False,
+    ))
+
+    fig.update_layout(
+        title="EU Health Collaborations by Country (Node Color = Degree)",
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False, scaleanchor="x"),
+        height=900,
+        margin=dict(l=20, r=20, t=50, b=20),
     )
-    
-    # Draw labels if requested
-    if show_labels:
-        nx.draw_networkx_labels(G, geo_pos, ax=ax, font_size=9, font_weight='bold')
-    
-    # Title and colorbar
-    ax.set_title("EU Health Collaborations by Country (Node Color = Degree)")
-    ax.axis('off')
-    
-    # Add colorbar
-    sm = plt.cm.ScalarMappable(norm=norm, cmap=cmap)
-    sm.set_array([])  # needed for colorbar to render properly
-    cbar = fig.colorbar(sm, ax=ax, shrink=0.8)
-    cbar.set_label('Number of Collaborating Countries')
-    
-    plt.tight_layout()
     return fig
 
 
 # Add this function to graph_utils.py after the existing functions
 
 
+@figure_cache()
 def create_trendline_plot(
     data: DataFrame,
     x_col: str,
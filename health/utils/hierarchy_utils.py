@@ -0,0 +1,103 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from safetensors import safe_open
+from scipy.cluster import hierarchy as sch
+
+
+def load_topic_hierarchy(path: str, labels: list) -> dict:
+    """Load the precomputed topic linkage; leaf i is the topic labelled labels[i]"""
+    with safe_open(path, framework="numpy") as f:
+        linkage = f.get_tensor("linkage")
+    if len(linkage) + 1 != len(labels):
+        raise ValueError(f"Hierarchy has {len(linkage) + 1} topics, model has {len(labels)}")
+    return {"linkage": linkage, "labels": labels}
+
+
+def node_members(linkage: np.ndarray) -> list:
+    """Topic ids under every node of the linkage (leaves first, then merges)"""
+    members = [[leaf] for leaf in range(len(linkage) + 1)]
+    for left, right, _, _ in linkage:
+        members.append(members[int(left)] + members[int(right)])
+    return members
+
+
+def topic_groups(hierarchy: dict, n_groups: int) -> list:
+    """Cut the tree into at most `n_groups` branches, each a list of topic ids"""
+    n_groups = int(np.clip(n_groups, 1, len(hierarchy["labels"])))
+    assignment = sch.fcluster(hierarchy["linkage"], t=n_groups, criterion="maxclust")
+    groups = [np.flatnonzero(assignment == group).tolist() for group in np.unique(assignment)]
+    # Follow the dendrogram's leaf order so branch numbers read top to bottom
+    position = {leaf: index for index, leaf in enumerate(sch.leaves_list(hierarchy["linkage"]))}
+    return sorted(groups, key=lambda topics: min(position[topic] for topic in topics))
+
+
+def group_choices(hierarchy: dict, n_groups: int) -> dict:
+    """Selectize choices for filtering by branch: group index -> short description"""
+    choices = {}
+    for index, topics in enumerate(topic_groups(hierarchy, n_groups)):
+        names = [hierarchy["labels"][topic].split("-", 1)[-1] for topic in topics]
+        shown = ", ".join(names[:3]) + (f" + {len(names) - 3} more" if len(names) > 3 else "")
+        choices[str(index)] = f"Branch {index + 1} ({len(topics)} topic{'s' * (len(topics) > 1)}): {shown}"
+    return choices
+
+
+def create_topic_dendrogram(hierarchy: dict, n_groups: int = None, title: str = "") -> go.FigureWidget:
+    """
+    Horizontal dendrogram of the topics. With `n_groups`, the tree is
+    collapsed to that many branches, each drawn as a leaf with a marker in
+    its branch color.
+    """
+    linkage, labels = hierarchy["linkage"], hierarchy["labels"]
+    n_topics = len(labels)
+    n_groups = n_topics if n_groups is None else int(np.clip(n_groups, 1, n_topics))
+
+    members = node_members(linkage)
+    branch = {topic: index for index, topics in enumerate(topic_groups(hierarchy, n_groups)) for topic in topics}
+
+    def leaf_label(node):
+        if node < n_topics:
+            return labels[node]
+        return f"Branch {branch[members[node][0]] + 1} ({len(members[node])} topics)"
+
+    collapsed = n_groups < n_topics
+    tree = sch.dendrogram(
+        linkage,
+        p=n_groups,
+        truncate_mode="lastp" if collapsed else None,
+        leaf_label_func=leaf_label,
+        orientation="left",
+        no_plot=True,
+    )
+
+    fig = go.Figure()
+    for icoord, dcoord in zip(tree["icoord"], tree["dcoord"]):
+        fig.add_trace(
+            go.Scatter(x=dcoord, y=icoord, mode="lines", line=dict(color="#888888", width=1.5), hoverinfo="skip")
+        )
+
+    leaf_positions = [5 + 10 * index for index in range(len(tree["ivl"]))]
+    if collapsed:
+        # Truncation leaves no links below the cut, so the branches are colored at their leaves
+        palette = px.colors.qualitative.D3
+        colors = [palette[branch[members[node][0]] % len(palette)] for node in tree["leaves"]]
+        fig.add_trace(go.Scatter(
+            x=[0] * len(leaf_positions),
+            y=leaf_positions,
+            mode="markers",
+            marker=dict(color=colors, size=12, line=dict(color="black", width=1)),
+            text=tree["ivl"],
+            hoverinfo="text",
+        ))
+    fig.update_layout(
+        title=title,
+        showlegend=False,
+        plot_bgcolor="white",
+        height=max(300, 24 * len(leaf_positions) + 100),
+        width=1000,
+        xaxis=dict(title="Distance", showgrid=True, gridcolor="#d2d2d2", gridwidth=0.5, zeroline=False),
+        yaxis=dict(tickvals=leaf_positions, ticktext=tree["ivl"], side="right", autorange="reversed",
+                   showgrid=False, zeroline=False),
+        margin=dict(r=400),
+    )
+    return go.FigureWidget(fig)
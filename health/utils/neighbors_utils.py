@@ -0,0 +1,70 @@
+import os
+import pickle
+
+import numpy as np
+from pandas import DataFrame
+from sklearn.neighbors import KDTree
+
+from utils.embedding_utils import open_store, read_rows
+
+
+def index_path_for(embeddings_path: str) -> str:
+    """The KD-tree is persisted next to the embeddings it indexes"""
+    return os.path.splitext(embeddings_path)[0] + ".kdtree.pkl"
+
+
+def file_fingerprint(path: str) -> tuple:
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def load_neighbor_index(embeddings_path: str, leaf_size: int = 40, persist: bool = True) -> KDTree:
+    """
+    Load the KD-tree over an embeddings file, building it (and saving it next
+    to the embeddings when `persist`) if it is missing or older than the file.
+    """
+    index_path = index_path_for(embeddings_path)
+    fingerprint = file_fingerprint(embeddings_path)
+
+    if os.path.exists(index_path):
+        with open(index_path, "rb") as f:
+            saved = pickle.load(f)
+        if saved["fingerprint"] == fingerprint:
+            return saved["tree"]
+
+    embeddings = read_rows(open_store(embeddings_path))
+    tree = KDTree(np.asarray(embeddings, dtype=np.float64), leaf_size=leaf_size)
+
+    if persist:
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"fingerprint": fingerprint, "tree": tree}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, index_path)
+        except OSError:
+            pass
+    return tree
+
+
+def query_similar(tree: KDTree, rows, k: int = 10) -> DataFrame:
+    """
+    Nearest neighbours of one or more projects in a single batched query.
+    For a selection, each candidate is ranked by its distance to the
+    closest selected project and the selected projects are excluded.
+    """
+    rows = np.unique(np.atleast_1d(np.asarray(rows, dtype=np.int64)))
+    if len(rows) == 0:
+        return DataFrame({"row": [], "distance": []})
+
+    data = np.asarray(tree.data)
+    n_query = min(k + len(rows), len(data))
+    distances, neighbors = tree.query(data[rows], k=n_query)
+
+    distances, neighbors = distances.ravel(), neighbors.ravel()
+    keep = ~np.isin(neighbors, rows)
+    distances, neighbors = distances[keep], neighbors[keep]
+
+    order = np.argsort(distances, kind="stable")
+    neighbors, first = np.unique(neighbors[order], return_index=True)
+    result = DataFrame({"row": neighbors, "distance": distances[order][first]})
+    return result.sort_values("distance").head(k).reset_index(drop=True)
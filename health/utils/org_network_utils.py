@@ -0,0 +1,273 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from pandas import DataFrame
+
+from utils.cache_utils import content_hash, data_cache, frame_version
+from utils.graph_utils import incidence_matrix
+
+# Centralities run in a small process pool so a large organisation graph
+# never blocks the event loop; results are shared per dataset version.
+NETWORK_WORKERS = int(os.environ.get("HEALTH_APP_NETWORK_WORKERS", 1))
+BETWEENNESS_SAMPLES = int(os.environ.get("HEALTH_APP_BETWEENNESS_SAMPLES", 256))
+
+METRIC_COLUMNS = {
+    "PageRank": "PageRank",
+    "Betweenness": "Betweenness (sampled)",
+    "Weighted Degree": "Shared projects",
+    "Degree": "Collaborators",
+}
+
+_executor = None
+_futures = {}
+_lock = threading.Lock()
+
+
+def co_participation_matrix(project_ids, org_ids):
+    """
+    Symmetric organisation x organisation matrix of shared projects (the
+    off-diagonal of B^T B for the project x organisation incidence B),
+    and the organisation IDs in row order.
+    """
+    incidence, organisations = incidence_matrix(pd.Series(project_ids), pd.Series(org_ids))
+    adjacency = (incidence.T @ incidence).tocsr()
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    return adjacency, organisations
+
+
+def pagerank(adjacency, alpha=0.85, tol=1e-10, max_iter=200):
+    """Weighted PageRank by power iteration; organisations without collaborators teleport uniformly"""
+    n = adjacency.shape[0]
+    out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inverse = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    transposed = adjacency.T.tocsr()
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        previous = rank
+        rank = alpha * (transposed @ (rank * inverse))
+        rank += (alpha * previous[dangling].sum() + 1 - alpha) / n
+        if np.abs(rank - previous).sum() < n * tol:
+            break
+    return rank
+
+
+def sampled_betweenness(adjacency, samples=BETWEENNESS_SAMPLES, batch_size=32, seed=42):
+    """
+    Normalized betweenness estimated from `samples` BFS sources (exact when
+    samples >= n), as networkx's betweenness_centrality(k=...) scales it.
+    Sources are processed in batches: each BFS level and each dependency
+    back-propagation step is one sparse x dense product.
+    """
+    n = adjacency.shape[0]
+    if n < 3:
+        return np.zeros(n)
+    links = adjacency.copy()
+    links.data[:] = 1.0
+    links = links.astype(np.float64)
+
+    rng = np.random.default_rng(seed)
+    sources = np.arange(n) if samples >= n else rng.choice(n, size=samples, replace=False)
+    centrality = np.zeros(n)
+    for start in range(0, len(sources), batch_size):
+        batch = sources[start:start + batch_size]
+        columns = np.arange(len(batch))
+        sigma = np.zeros((n, len(batch)))
+        sigma[batch, columns] = 1.0
+        depth = np.full((n, len(batch)), -1, dtype=np.int32)
+        depth[batch, columns] = 0
+
+        frontier, level = sigma.copy(), 0
+        while True:
+            reached = links @ frontier
+            reached[depth >= 0] = 0
+            if not reached.any():
+                break
+            level += 1
+            depth[reached > 0] = level
+            sigma += reached
+            frontier = reached
+
+        delta = np.zeros_like(sigma)
+        safe_sigma = np.where(sigma > 0, sigma, 1.0)
+        for current in range(level, 0, -1):
+            weights = np.where(depth == current, (1 + delta) / safe_sigma, 0)
+            delta += np.where(depth == current - 1, sigma * (links @ weights), 0)
+        delta[batch, columns] = 0
+        centrality += delta.sum(axis=1)
+
+    return centrality * (n / len(sources)) / ((n - 1) * (n - 2))
+
+
+def compute_org_metrics(project_ids, org_ids, samples=BETWEENNESS_SAMPLES) -> DataFrame:
+    """Degree, weighted degree, PageRank and sampled betweenness for every organisation"""
+    adjacency, organisations = co_participation_matrix(project_ids, org_ids)
+    return DataFrame({
+        "organisationID": organisations,
+        "Degree": np.diff(adjacency.indptr),
+        "Weighted Degree": np.asarray(adjacency.sum(axis=1)).ravel().astype(np.int64),
+        "PageRank": pagerank(adjacency),
+        "Betweenness": sampled_betweenness(adjacency, samples),
+    })
+
+
+def metrics_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=NETWORK_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(shutdown_executor)
+        return _executor
+
+
+def shutdown_executor():
+    """Stop the worker processes, cancelling jobs that have not started"""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+        _futures.clear()
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def org_metrics_future(data: DataFrame, samples=BETWEENNESS_SAMPLES):
+    """
+    Future of the organisation metrics for this dataset version. The first
+    caller submits the job to the pool; later callers (any session) share it.
+    """
+    version = frame_version(data)
+    if version is None:
+        version = content_hash(data)
+    key = (version, samples)
+    with _lock:
+        future = _futures.get(key)
+        if future is not None and not (future.done() and future.exception() is not None):
+            return future
+    future = metrics_executor().submit(
+        compute_org_metrics,
+        data["projectID"].to_numpy(),
+        data["organisationID"].to_numpy(),
+        samples,
+    )
+    with _lock:
+        return _futures.setdefault(key, future)
+
+
+@data_cache()
+def organisation_directory(data: DataFrame) -> DataFrame:
+    """Name, country and project count of every organisation, indexed by organisationID"""
+    return (
+        data.dropna(subset=["organisationID"])
+            .groupby("organisationID", observed=True)
+            .agg(
+                Organisation=("name", "first"),
+                Country=("country_name", "first"),
+                Projects=("projectID", "nunique"),
+            )
+    )
+
+
+@data_cache()
+def org_network(data: DataFrame) -> dict:
+    """The co-participation matrix and its row order, built once per dataset version"""
+    adjacency, organisations = co_participation_matrix(data["projectID"], data["organisationID"])
+    return {"adjacency": adjacency, "organisations": organisations}
+
+
+def org_metrics_table(metrics: DataFrame, directory: DataFrame, rank_by="PageRank", top_n=20) -> DataFrame:
+    """Top organisations by one centrality, with readable column names"""
+    top = metrics.nlargest(top_n, rank_by).join(directory, on="organisationID")
+    return top[["Organisation", "Country", "Projects", *METRIC_COLUMNS]].rename(columns=METRIC_COLUMNS)
+
+
+def org_choices(directory: DataFrame) -> dict:
+    """Selectize choices for the organisation search, most active first"""
+    ordered = directory.sort_values("Projects", ascending=False)
+    return {
+        str(org_id): f"{name} ({country})"
+        for org_id, name, country in zip(ordered.index, ordered["Organisation"], ordered["Country"])
+    }
+
+
+def ego_network(network: dict, org_id, max_neighbors=25) -> nx.Graph:
+    """
+    An organisation, its `max_neighbors` strongest collaborators and the
+    links among them. Only the rows of those organisations are touched, so
+    the cost does not depend on the size of the whole graph.
+    """
+    organisations = network["organisations"]
+    row = int(np.searchsorted(organisations, org_id))
+    if row >= len(organisations) or organisations[row] != org_id:
+        return nx.Graph()
+
+    adjacency = network["adjacency"]
+    start, stop = adjacency.indptr[row], adjacency.indptr[row + 1]
+    neighbours, weights = adjacency.indices[start:stop], adjacency.data[start:stop]
+    strongest = neighbours[np.argsort(-weights, kind="stable")[:max_neighbors]]
+    rows = np.concatenate([[row], strongest])
+
+    sub = adjacency[rows][:, rows].tocoo()
+    G = nx.Graph()
+    G.add_nodes_from(organisations[rows])
+    G.add_weighted_edges_from(
+        (organisations[rows[i]], organisations[rows[j]], int(w))
+        for i, j, w in zip(sub.row, sub.col, sub.data) if i < j
+    )
+    return G
+
+
+def create_ego_network_plot(G: nx.Graph, org_id, directory: DataFrame) -> go.Figure:
+    """Plotly view of an ego-network: node size = shared projects with the selected organisation"""
+    fig = go.Figure()
+    if G.number_of_nodes() == 0:
+        fig.update_layout(title="No collaborations found")
+        return fig
+
+    pos = nx.spring_layout(G, weight="weight", seed=42)
+    edge_x, edge_y = [], []
+    for u, v in G.edges():
+        edge_x += [pos[u][0], pos[v][0], None]
+        edge_y += [pos[u][1], pos[v][1], None]
+    fig.add_trace(go.Scatter(
+        x=edge_x, y=edge_y, mode="lines",
+        line=dict(color="lightgrey", width=1), hoverinfo="skip", showlegend=False,
+    ))
+
+    nodes = list(G.nodes())
+    info = directory.reindex(nodes)
+    shared = [G[org_id][node]["weight"] if node != org_id else 0 for node in nodes]
+    biggest = max(shared) or 1
+    fig.add_trace(go.Scatter(
+        x=[pos[node][0] for node in nodes],
+        y=[pos[node][1] for node in nodes],
+        mode="markers",
+        marker=dict(
+            size=[30 if node == org_id else 8 + 22 * weight / biggest for node, weight in zip(nodes, shared)],
+            color=["red" if node == org_id else "steelblue" for node in nodes],
+            line=dict(color="black", width=1),
+        ),
+        text=[
+            f"{name} ({country})<br>Shared projects: {weight}" if node != org_id else f"{name} ({country})"
+            for node, name, country, weight in zip(nodes, info["Organisation"], info["Country"], shared)
+        ],
+        hoverinfo="text",
+        showlegend=False,
+    ))
+    fig.update_layout(
+        plot_bgcolor="white",
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        height=600,
+        margin=dict(l=20, r=20, t=20, b=20),
+    )
+    return fig
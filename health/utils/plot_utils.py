@@ -6,7 +6,10 @@ from sklearn.linear_model import LinearRegression
 from statsmodels.nonparametric.smoothers_lowess import lowess
 import statsmodels.api as sm
 
+from utils.cache_utils import figure_cache
 
+
+@figure_cache(selection="country")
 def create_funds_bar_chart(
     data: DataFrame,
     country: str,
@@ -70,6 +73,7 @@ def create_funds_bar_chart(
     return go.FigureWidget(fig)
 
 
+@figure_cache(selection="country")
 def create_scatter_plot(
     data: DataFrame,
     country: str,
@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+from pandas import DataFrame
+from safetensors import safe_open
+
+
+def load_topic_similarity(path: str) -> dict:
+    """Load the topic x topic and topic x EuroSciVoc matrices written by pipeline.similarity"""
+    with safe_open(path, framework="numpy") as f:
+        metadata = f.metadata()
+        similarity = {name: f.get_tensor(name) for name in f.keys()}
+    similarity["labels"] = json.loads(metadata["labels"])
+    similarity["fields"] = json.loads(metadata["fields"])
+    return similarity
+
+
+def selected_rows(similarity: dict, topic: list) -> np.ndarray:
+    """Matrix rows of the selected topic labels, in topic order"""
+    if not isinstance(topic, (list, tuple)):
+        topic = [topic]
+    selected = set(topic)
+    return np.array([row for row, label in enumerate(similarity["labels"]) if label in selected], dtype=np.int64)
+
+
+def create_topic_similarity_heatmap(similarity: dict, topic: list, title: str = "") -> go.FigureWidget:
+    """Cosine similarity between the keyword embeddings of the selected topics"""
+    if similarity is None:
+        fig = go.Figure()
+        fig.update_layout(title="Topic similarities have not been computed for this dataset", plot_bgcolor="white")
+        return go.FigureWidget(fig)
+
+    rows = selected_rows(similarity, topic)
+    if len(rows) == 0:
+        fig = go.Figure()
+        fig.update_layout(title="No topics selected", plot_bgcolor="white")
+        return go.FigureWidget(fig)
+
+    labels = [similarity["labels"][row] for row in rows]
+    fig = go.Figure(
+        go.Heatmap(
+            z=similarity["topic_topic"][np.ix_(rows, rows)],
+            x=labels,
+            y=labels,
+            colorscale="Blues",
+            zmin=0,
+            zmax=1,
+            hovertemplate="%{y}<br>%{x}<br>Similarity: %{z:.2f}<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        title=title,
+        plot_bgcolor="white",
+        height=max(400, 28 * len(rows) + 200),
+        width=1000,
+        xaxis=dict(showticklabels=False),
+        yaxis=dict(autorange="reversed"),
+    )
+    return go.FigureWidget(fig)
+
+
+def closest_fields(similarity: dict, topic: list, n_fields: int = 3) -> DataFrame:
+    """The EuroSciVoc fields closest to each selected topic, plus its alignment score"""
+    if similarity is None:
+        return DataFrame(columns=["Topic", "Alignment", "Closest EuroSciVoc Fields"])
+
+    rows = selected_rows(similarity, topic)
+    if len(rows) == 0 or len(similarity["fields"]) == 0:
+        return DataFrame(columns=["Topic", "Alignment", "Closest EuroSciVoc Fields"])
+
+    scores = similarity["topic_field"][rows]
+    n_fields = min(n_fields, scores.shape[1])
+    best = np.argsort(-scores, axis=1)[:, :n_fields]
+    fields = similarity["fields"]
+    return DataFrame({
+        "Topic": [similarity["labels"][row] for row in rows],
+        "Alignment": similarity["alignment"][rows],
+        "Closest EuroSciVoc Fields": [
+            ", ".join(f"{fields[column]} ({score:.2f})" for column, score in zip(columns, scores[i, columns]))
+            for i, columns in enumerate(best)
+        ],
+    }).sort_values("Alignment", ascending=False)
@@ -1,86 +1,105 @@
-import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from pandas import DataFrame
-# from bertopic import BERTopic
-# from umap import UMAP
-import os
-import base64
-    
+from plotly.subplots import make_subplots
 
-def create_static_topic_map(image_path: str, width: int = 1000, height: int = 800) -> go.Figure:
-   # Create a basic figure
-    fig = go.Figure()
-    
-    if os.path.exists(image_path):
-        # Create a data URL for the image
-        with open(image_path, "rb") as img_file:
-            img_bytes = img_file.read()
-            encoded = base64.b64encode(img_bytes).decode("utf-8")
-            img_src = f"data:image/png;base64,{encoded}"
-        
-        # Add trace instead of layout_image (more reliable)
+from utils.cache_utils import figure_cache
+
+
+def create_topic_kwords(
+    model: dict,
+    topic: list,
+    title: str = "",
+    n_words: int = 6,
+    n_cols: int = 4,
+) -> go.FigureWidget:
+    """Top c-TF-IDF keywords per topic as a grid of bar charts (like BERTopic's visualize_barchart)"""
+    if not isinstance(topic, (list, tuple)):
+        topic = [topic]
+    label_to_topic = {label: index for index, label in enumerate(model["labels"])}
+    topics = sorted(label_to_topic[label] for label in topic if label in label_to_topic)
+    if not topics:
+        fig = go.Figure()
+        fig.update_layout(title="No topics selected", plot_bgcolor="white")
+        return go.FigureWidget(fig)
+
+    n_cols = min(n_cols, len(topics))
+    n_rows = -(-len(topics) // n_cols)
+    fig = make_subplots(
+        rows=n_rows,
+        cols=n_cols,
+        subplot_titles=[f"Topic {topic_id}" for topic_id in topics],
+        horizontal_spacing=0.1,
+        vertical_spacing=0.4 / n_rows,
+    )
+    colors = px.colors.qualitative.D3
+    for i, topic_id in enumerate(topics):
+        words_scores = model["representations"][topic_id][:n_words][::-1]
         fig.add_trace(
-            go.Scatter(
-                x=[0, 1],
-                y=[0, 1],
-                mode="markers",
-                marker=dict(opacity=0),  # Invisible markers
-                showlegend=False,
-            )
+            go.Bar(
+                x=[score for _, score in words_scores],
+                y=[word for word, _ in words_scores],
+                orientation="h",
+                marker_color=colors[i % len(colors)],
+                hovertemplate="%{y}: %{x:.4f}<extra></extra>",
+            ),
+            row=i // n_cols + 1,
+            col=i % n_cols + 1,
         )
-        
-        # Use layout image with different parameters
-        fig.update_layout(
-            images=[
-                dict(
-                    source=img_src,
-                    xref="paper", yref="paper",
-                    x=0, y=1,
-                    sizex=1, sizey=1,
-                    sizing="stretch",  # "stretch" works better than "contain"
-                    layer="below"
-                )
-            ],
-            width=width, 
-            height=height,
-            xaxis=dict(visible=False, range=[0, 1]),
-            yaxis=dict(visible=False, range=[0, 1]),
-            plot_bgcolor="rgba(0,0,0,0)"
+
+    fig.update_layout(
+        title=title,
+        showlegend=False,
+        plot_bgcolor="white",
+        height=250 * n_rows,
+        width=1000,
+    )
+    fig.update_xaxes(showgrid=True, gridcolor="#d2d2d2", gridwidth=0.5)
+    fig.update_yaxes(showgrid=True, gridcolor="#d2d2d2", gridwidth=0.5)
+
+    return go.FigureWidget(fig)
+
+
+def build_topic_cube(data: DataFrame) -> DataFrame:
+    """
+    Aggregate projects into one row per (topic, year) with the project count
+    and the sums and non-null counts of funding and publications. Projects
+    without a signature year keep a missing year so totals stay complete.
+    """
+    cube = (
+        data.assign(
+            funding_n=data["ecMaxContribution"].notna(),
+            publication_n=data["publication_count"].notna(),
         )
-    else:
-        fig.add_annotation(
-            text="Image not found",
-            x=0.5, y=0.5,
-            xref="paper", yref="paper",
-            showarrow=False,
-            font=dict(size=20)
+        .groupby(["topic", "topic_label", "year"], observed=True, dropna=False)
+        .agg(
+            count=("topic", "size"),
+            funding_sum=("ecMaxContribution", "sum"),
+            funding_n=("funding_n", "sum"),
+            publication_sum=("publication_count", "sum"),
+            publication_n=("publication_n", "sum"),
         )
-    
-    return fig
-
-
-# def create_topic_kwords(
-#     model: BERTopic,
-#     topics: list = None,
-#     title: str = "",
-#     n_words: int = 6
-# ) -> go.FigureWidget:
-#     """Create topic barchart visualization from BERTopic model"""
-#     # If no topics specified, use first 10 topics
-#     if topics is None:
-#         topics = list(range(23))
-        
-#     fig = model.visualize_barchart(topics=topics, n_words=n_words)
-    
-#     fig.update_layout(
-#         plot_bgcolor="white",
-#         title=title
-#     )
-    
-#     return go.FigureWidget(fig)
+        .reset_index()
+    )
+    return cube
 
 
+def select_topic_totals(cube: DataFrame, topic) -> DataFrame:
+    """Sum the cube over years for the selected topics"""
+    if not isinstance(topic, (list, tuple)):
+        topic = [topic]
+    selected = cube[cube["topic_label"].isin(topic)]
+    topic_ids, rows = np.unique(selected["topic"].to_numpy(), return_inverse=True)
+
+    totals = {"topic": topic_ids}
+    totals["topic_label"] = selected["topic_label"].to_numpy()[np.unique(rows, return_index=True)[1]]
+    for column in ["count", "funding_sum", "funding_n", "publication_sum", "publication_n"]:
+        totals[column] = np.bincount(rows, weights=selected[column].to_numpy(), minlength=len(topic_ids))
+    return DataFrame(totals)
+
+
+@figure_cache(selection="topic")
 def create_topic_trend(
     data: DataFrame,
     topic: str,
@@ -90,16 +109,13 @@ def create_topic_trend(
     
     if not isinstance(topic, (list, tuple)):
         topic = [topic]
-    data_copy = data[data["topic_label"].isin(topic)].copy()
-
-    data_copy["ecSignatureDate_dt"] = pd.to_datetime(data_copy["ecSignatureDate"])
-    data_copy["time_period"] = data_copy["ecSignatureDate_dt"].dt.year
+    selected = data["topic_label"].isin(topic) & data["year"].notna()
 
-    plot_data = data_copy.groupby(["time_period", "topic", "topic_label"]).size().reset_index(name="count")
+    plot_data = data.loc[selected, ["year", "topic", "topic_label", "count"]].sort_values("year")
 
     fig = px.line(
         data_frame=plot_data,
-        x="time_period",
+        x="year",
         y="count",
         color="topic",
         hover_name="topic_label",
@@ -128,6 +144,7 @@ def create_topic_trend(
     return go.FigureWidget(fig)
 
 
+@figure_cache(selection="topic")
 def create_topic_total_funding(
     data: DataFrame,
     topic: str,
@@ -135,15 +152,8 @@ def create_topic_total_funding(
     labels: dict,
 ) -> go.FigureWidget:
     
-    if not isinstance(topic, (list, tuple)):
-        topic = [topic]
-    data_copy = data[data["topic_label"].isin(topic)].copy()
-
-    data_copy["ecMaxContribution"] = (
-        data_copy["ecMaxContribution"].str.replace(",", ".", regex=False).astype(float)
-    )
-
-    total_funding_by_topic = data_copy.groupby(["topic", "topic_label"])["ecMaxContribution"].sum().reset_index()
+    total_funding_by_topic = select_topic_totals(data, topic)
+    total_funding_by_topic["ecMaxContribution"] = total_funding_by_topic["funding_sum"]
 
     fig = px.bar(
         total_funding_by_topic,
@@ -173,6 +183,7 @@ def create_topic_total_funding(
     return go.FigureWidget(fig)
 
 
+@figure_cache(selection="topic")
 def create_topic_avg_funding(
     data: DataFrame,
     topic: str,
@@ -180,16 +191,11 @@ def create_topic_avg_funding(
     labels: dict,
 ) -> go.FigureWidget:
 
-    if not isinstance(topic, (list, tuple)):
-        topic = [topic]
-    data_copy = data[data["topic_label"].isin(topic)].copy()
-
-    data_copy["ecMaxContribution"] = (
-        data_copy["ecMaxContribution"].str.replace(",", ".", regex=False).astype(float)
+    avg_funding_by_topic = select_topic_totals(data, topic)
+    avg_funding_by_topic["ecMaxContribution"] = (
+        avg_funding_by_topic["funding_sum"] / avg_funding_by_topic["funding_n"]
     )
 
-    avg_funding_by_topic = data_copy.groupby(["topic", "topic_label"])["ecMaxContribution"].mean().reset_index()
-
     fig = px.bar(
         avg_funding_by_topic,
         x="topic",
@@ -217,6 +223,7 @@ def create_topic_avg_funding(
 
     return go.FigureWidget(fig)
 
+@figure_cache(selection="topic")
 def create_topic_total_publication(
     data: DataFrame,
     topic: str,
@@ -224,11 +231,8 @@ def create_topic_total_publication(
     labels: dict,
 ) -> go.FigureWidget:
 
-    if not isinstance(topic, (list, tuple)):
-        topic = [topic]
-    data_copy = data[data["topic_label"].isin(topic)].copy()
-
-    total_publication_by_topic = data_copy.groupby(["topic", "topic_label"])["publication_count"].sum().reset_index()
+    total_publication_by_topic = select_topic_totals(data, topic)
+    total_publication_by_topic["publication_count"] = total_publication_by_topic["publication_sum"]
 
     fig = px.bar(
         total_publication_by_topic,
@@ -258,6 +262,7 @@ def create_topic_total_publication(
     return go.FigureWidget(fig)
 
 
+@figure_cache(selection="topic")
 def create_topic_avg_publication(
     data: DataFrame,
     topic: str,
@@ -265,11 +270,10 @@ def create_topic_avg_publication(
     labels: dict,
 ) -> go.FigureWidget:
 
-    if not isinstance(topic, (list, tuple)):
-        topic = [topic]
-    data_copy = data[data["topic_label"].isin(topic)].copy()
-    
-    avg_publication_by_topic = data_copy.groupby(["topic", "topic_label"])["publication_count"].mean().reset_index()
+    avg_publication_by_topic = select_topic_totals(data, topic)
+    avg_publication_by_topic["publication_count"] = (
+        avg_publication_by_topic["publication_sum"] / avg_publication_by_topic["publication_n"]
+    )
 
     fig = px.bar(
         avg_publication_by_topic,
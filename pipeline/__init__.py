@@ -0,0 +1,6 @@
+"""
+Batch jobs that turn the raw CORDIS exports into the artefacts the Shiny
+app in health/ loads. Run from the repository root, e.g.
+
+    python -m pipeline.assign --projects data/interim/health.csv
+"""
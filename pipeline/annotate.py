@@ -0,0 +1,167 @@
+"""
+Entity extraction for topic_entities_raw.xlsx (archive/test.ipynb) on a
+cached, multi-process spaCy pipeline. The default scispaCy model is not on
+PyPI; install it with
+
+    pip install https://s3-us-west-2.amazonaws.com/ai2-s2-scispacy/releases/v0.5.4/en_core_sci_lg-0.5.4.tar.gz
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+
+import pandas as pd
+
+from pipeline.embed import project_texts
+
+SPACY_MODEL = "en_core_sci_lg"
+CACHE_DIR = "data/cache/spacy"
+# Entity extraction and POS patterns need neither the parser nor lemmas,
+# so these components are not even loaded
+EXCLUDE = ["parser", "lemmatizer"]
+# Entities kept per topic, by word count, as in the notebook
+MIN_ENTITY_WORDS, MAX_ENTITY_WORDS = 2, 5
+
+
+def load_pipeline(model: str = SPACY_MODEL, exclude: list = EXCLUDE):
+    """A spaCy pipeline by package name or path, or "blank:<lang>" for a tokenizer-only pipeline"""
+    import spacy
+
+    if model.startswith("blank:"):
+        return spacy.blank(model.split(":", 1)[1])
+    return spacy.load(model, exclude=exclude)
+
+
+def pipeline_cache_dir(cache_dir: str, nlp) -> str:
+    """Annotations depend on the pipeline, its version and the components that ran"""
+    name = f"{nlp.meta['lang']}_{nlp.meta['name']}-{nlp.meta['version']}-{'+'.join(nlp.pipe_names) or 'tokenizer'}"
+    return os.path.join(cache_dir, re.sub(r"[^\w.+-]+", "_", name))
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def load_cache_index(model_dir: str) -> dict:
+    """Map every cached text key to its DocBin shard and position; shards without a key list are incomplete"""
+    index = {}
+    for keys_path in sorted(glob.glob(os.path.join(model_dir, "shard-*.json"))):
+        with open(keys_path, encoding="utf-8") as f:
+            keys = json.load(f)
+        shard_path = keys_path[:-len(".json")] + ".spacy"
+        index.update({key: (shard_path, position) for position, key in enumerate(keys)})
+    return index
+
+
+def write_shard(model_dir: str, keys: list, docs: list) -> str:
+    from spacy.tokens import DocBin
+
+    os.makedirs(model_dir, exist_ok=True)
+    shard_path = os.path.join(model_dir, f"shard-{time.time_ns()}-{os.getpid()}.spacy")
+    DocBin(docs=docs, store_user_data=True).to_disk(shard_path)
+    # The key list is written last and marks the shard as complete
+    tmp_path = f"{shard_path[:-len('.spacy')]}.json.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(keys, f)
+    os.replace(tmp_path, shard_path[:-len(".spacy")] + ".json")
+    return shard_path
+
+
+def read_docs(nlp, index: dict, keys: list) -> list:
+    """Deserialize the cached docs for `keys`, reading each shard once"""
+    from spacy.tokens import DocBin
+
+    shards = {}
+    for key in keys:
+        shard_path, _ = index[key]
+        if shard_path not in shards:
+            shards[shard_path] = list(DocBin().from_disk(shard_path).get_docs(nlp.vocab))
+    return [shards[index[key][0]][index[key][1]] for key in keys]
+
+
+def annotate_texts(
+    texts: list,
+    nlp=None,
+    cache_dir: str = CACHE_DIR,
+    n_process: int = 1,
+    batch_size: int = 64,
+    shard_size: int = 1000,
+) -> list:
+    """
+    Annotated spaCy docs for `texts`, in order. Docs are cached as DocBin
+    shards keyed by text hash under a directory named after the pipeline and
+    its active components; only uncached texts go through `nlp.pipe` (over
+    `n_process` processes), and every `shard_size` docs are checkpointed.
+    """
+    nlp = nlp or load_pipeline()
+    model_dir = pipeline_cache_dir(cache_dir, nlp)
+    keys = [text_key(text) for text in texts]
+    index = load_cache_index(model_dir)
+
+    misses = {}
+    for key, text in zip(keys, texts):
+        if key not in index:
+            misses.setdefault(key, text)
+    print(f"{sum(key in index for key in keys)}/{len(texts)} docs cached, {len(misses)} to annotate")
+
+    if misses:
+        start = time.perf_counter()
+        miss_keys, shard_keys, shard_docs = list(misses), [], []
+        docs = nlp.pipe(misses.values(), n_process=n_process, batch_size=batch_size)
+        for done, (key, doc) in enumerate(zip(miss_keys, docs), start=1):
+            shard_keys.append(key)
+            shard_docs.append(doc)
+            if len(shard_docs) == shard_size or done == len(miss_keys):
+                shard_path = write_shard(model_dir, shard_keys, shard_docs)
+                index.update({shard_key: (shard_path, position) for position, shard_key in enumerate(shard_keys)})
+                shard_keys, shard_docs = [], []
+                print(f"Annotated {done}/{len(miss_keys)} ({done / (time.perf_counter() - start):.1f} docs/s)")
+
+    return read_docs(nlp, index, keys)
+
+
+def entity_frequencies(docs: list, topics: list, top_n: int = 30) -> dict:
+    """
+    Most frequent entities of 2-5 words per topic, as the sheets of
+    topic_entities_raw.xlsx: "Topic_<id>" -> Entity/Frequency table, in the
+    order the topics first appear.
+    """
+    counts = {}
+    for doc, topic in zip(docs, topics):
+        counter = counts.setdefault(topic, Counter())
+        for ent in doc.ents:
+            if MIN_ENTITY_WORDS <= len(ent.text.split()) <= MAX_ENTITY_WORDS:
+                counter[ent.text.strip()] += 1
+    return {
+        f"Topic_{topic}": pd.DataFrame(counter.most_common(top_n), columns=["Entity", "Frequency"])
+        for topic, counter in counts.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate project texts with spaCy, caching the parsed docs")
+    parser.add_argument("--topic-df", default="data/processed/topic_df.csv")
+    parser.add_argument("--output", default="data/processed/topic_entities_raw.xlsx")
+    parser.add_argument("--model", default=SPACY_MODEL, help="spaCy package, path, or blank:<lang>")
+    parser.add_argument("--exclude", nargs="*", default=EXCLUDE, help="Components not to load")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--n-process", type=int, default=max(1, (os.cpu_count() or 1) - 1))
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--top", type=int, default=30)
+    args = parser.parse_args()
+
+    topic_df = pd.read_csv(args.topic_df, usecols=["title", "abstract", "topic"])
+    texts = project_texts(topic_df.rename(columns={"abstract": "objective"}))
+    nlp = load_pipeline(args.model, args.exclude)
+    docs = annotate_texts(texts, nlp, args.cache_dir, args.n_process, args.batch_size)
+    with pd.ExcelWriter(args.output) as writer:
+        for sheet, entities in entity_frequencies(docs, topic_df["topic"].tolist(), args.top).items():
+            entities.to_excel(writer, sheet_name=sheet, index=False)
+
+
+if __name__ == "__main__":
+    main()
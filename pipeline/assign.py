@@ -0,0 +1,182 @@
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from health.utils.ctfidf_utils import load_topic_info
+from health.utils.embedding_utils import open_store, read_rows
+from pipeline.embed import CACHE_DIR, EMBEDDING_MODEL, embed_texts, project_texts
+
+PROJECT_COLUMNS = ["projectID", "title", "objective", "status", "euroSciVocTitle",
+                   "ecSignatureDate", "totalCost", "ecMaxContribution"]
+PUBLICATION_COUNTS = "data/interim/publication_counts.csv"
+# Per-topic columns copied from the existing rows of a topic
+TOPIC_COLUMNS = ["topic_label", "MMR", "KeyBERT", "POS"]
+
+
+def text_hashes(titles: pd.Series, abstracts: pd.Series) -> pd.Series:
+    """Hash of the text the topic model sees (title + newline + abstract)"""
+    texts = titles.fillna("") + "\n" + abstracts.fillna("")
+    return texts.map(lambda text: hashlib.sha1(text.encode("utf-8")).hexdigest())
+
+
+def active_ids(projects_path: str) -> pd.Index:
+    """IDs of the non-terminated projects, read without the text columns"""
+    ids = pd.read_csv(projects_path, usecols=["projectID", "status"])
+    return pd.Index(ids.loc[ids["status"] != "TERMINATED", "projectID"].unique())
+
+
+def find_delta(
+    projects_path: str,
+    topic_df: pd.DataFrame,
+    active: pd.Index,
+    check_changes: bool = True,
+    chunk_size: int = 10_000,
+) -> pd.DataFrame:
+    """
+    Projects that are new, or whose title/abstract changed since the last run.
+    The projects CSV is streamed in chunks and only delta rows are kept; with
+    check_changes=False only the rows of unseen IDs are kept, so known
+    projects are never hashed.
+    """
+    known = topic_df["projectID"]
+    existing = pd.Series(
+        text_hashes(topic_df["title"], topic_df["abstract"]).to_numpy(), index=known
+    ) if check_changes else None
+    unseen = active.difference(known)
+
+    parts = []
+    reader = pd.read_csv(projects_path, usecols=lambda column: column in PROJECT_COLUMNS, chunksize=chunk_size)
+    for chunk in reader:
+        chunk = chunk[chunk["projectID"].isin(active)]
+        keep = chunk["projectID"].isin(unseen)
+        if check_changes:
+            previous = chunk["projectID"].map(existing)
+            keep |= previous.notna() & (previous != text_hashes(chunk["title"], chunk["objective"]))
+        parts.append(chunk[keep])
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=PROJECT_COLUMNS)
+
+
+def nearest_topics(embeddings: np.ndarray, topic_embeddings: np.ndarray, outliers: int):
+    """Nearest topic embedding by cosine similarity, as BERTopic.transform does for saved models"""
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarities = embeddings @ topic_embeddings.T
+    best = similarities.argmax(axis=1)
+    return best - outliers, similarities[np.arange(len(best)), best]
+
+
+def assign_new_projects(
+    projects_path: str,
+    topic_df_path: str,
+    model_dir: str,
+    model_name: str = EMBEDDING_MODEL,
+    cache_dir: str = CACHE_DIR,
+    chunk_size: int = 256,
+    publication_counts_path: str = PUBLICATION_COUNTS,
+    check_changes: bool = True,
+) -> pd.DataFrame:
+    """
+    Assign topics to new or changed projects with the saved model artefacts
+    and merge them into topic_df without refitting. Embedding and topic
+    assignment are proportional to the number of delta rows; projects that
+    left the source (or were terminated) are dropped and the per-topic Count
+    column is recomputed.
+
+    Limits: topic_df is read and rewritten in full, and with check_changes
+    every known project's title/abstract is re-hashed (the projects CSV is
+    streamed in chunks, so only delta rows are held in memory). New projects
+    take their publication count from publication_counts_path, or 0 when it
+    is missing. Topic keywords and labels are those of the last fit.
+    """
+    start = time.perf_counter()
+    topic_df = pd.read_csv(topic_df_path)
+    active = active_ids(projects_path)
+
+    removed = ~topic_df["projectID"].isin(active)
+    if removed.any():
+        print(f"Dropping {removed.sum()} projects no longer in {projects_path}")
+        topic_df = topic_df[~removed]
+
+    delta = find_delta(projects_path, topic_df, active, check_changes)
+    print(f"{len(delta)} new or changed projects out of {len(active)}")
+    if delta.empty:
+        if removed.any():
+            topic_df = write_topic_df(topic_df, topic_df_path)
+        return topic_df
+
+    topic_embeddings = read_rows(open_store(os.path.join(model_dir, "topic_embeddings.safetensors"), "topic_embeddings"))
+    topic_embeddings = topic_embeddings / np.linalg.norm(topic_embeddings, axis=1, keepdims=True)
+    info = load_topic_info(model_dir)
+
+    embeddings = embed_texts(project_texts(delta), model_name, cache_dir, batch_size=chunk_size)
+    topics, scores = nearest_topics(embeddings, topic_embeddings, info["outliers"])
+
+    new_rows = pd.DataFrame({
+        "projectID": delta["projectID"].to_numpy(),
+        "title": delta["title"].to_numpy(),
+        "abstract": delta["objective"].to_numpy(),
+        "topic": topics,
+        "euroSciVocTitle": delta["euroSciVocTitle"].to_numpy(),
+        "ecSignatureDate": delta["ecSignatureDate"].to_numpy(),
+        "totalCost": delta["totalCost"].to_numpy(),
+        "ecMaxContribution": delta["ecMaxContribution"].to_numpy(),
+    })
+    topic_meta = topic_df.drop_duplicates("topic").set_index("topic")[TOPIC_COLUMNS]
+    new_rows = new_rows.join(topic_meta, on="topic")
+    missing_label = new_rows["topic_label"].isna() & (new_rows["topic"] >= 0)
+    new_rows.loc[missing_label, "topic_label"] = new_rows.loc[missing_label, "topic"].map(
+        lambda topic: info["labels"][topic]
+    )
+
+    # Changed projects keep their publication counts; new ones read them from the counts file
+    publications = topic_df.set_index("projectID")["publication_count"]
+    if os.path.exists(publication_counts_path):
+        counts = pd.read_csv(publication_counts_path).set_index("projectID")["publicationCount"]
+        publications = publications.combine_first(counts)
+    new_rows["publication_count"] = new_rows["projectID"].map(publications).fillna(0)
+
+    updated = pd.concat(
+        [topic_df[~topic_df["projectID"].isin(new_rows["projectID"])], new_rows],
+        ignore_index=True,
+    )
+    updated = write_topic_df(updated[topic_df.columns], topic_df_path)
+
+    print(f"Mean similarity of new assignments: {scores.mean():.3f}")
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+    return updated
+
+
+def write_topic_df(topic_df: pd.DataFrame, topic_df_path: str) -> pd.DataFrame:
+    """Refresh the per-topic Count column and atomically replace topic_df"""
+    topic_df = topic_df.assign(Count=topic_df["topic"].map(topic_df["topic"].value_counts()))
+    tmp_path = f"{topic_df_path}.{os.getpid()}.tmp"
+    topic_df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, topic_df_path)
+    return topic_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign topics to new CORDIS projects without refitting")
+    parser.add_argument("--projects", default="data/interim/health.csv", help="Filtered health projects CSV")
+    parser.add_argument("--topic-df", default="data/processed/topic_df.csv")
+    parser.add_argument("--model-dir", default="data/processed/model_dir")
+    parser.add_argument("--model-name", default=EMBEDDING_MODEL)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--publication-counts", default=PUBLICATION_COUNTS,
+                        help="Per-project publication counts for new projects")
+    parser.add_argument("--new-only", action="store_true",
+                        help="Only assign unseen project IDs; skip re-hashing known projects")
+    args = parser.parse_args()
+
+    assign_new_projects(
+        args.projects, args.topic_df, args.model_dir, args.model_name, args.cache_dir, args.chunk_size,
+        publication_counts_path=args.publication_counts, check_changes=not args.new_only,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import glob
+import hashlib
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from safetensors import safe_open
+from safetensors.numpy import save_file
+
+from health.utils.embedding_utils import write_store
+
+EMBEDDING_MODEL = "NovaSearch/stella_en_400M_v5"
+CACHE_DIR = "data/cache/embeddings"
+
+
+def project_texts(projects: pd.DataFrame) -> list:
+    """The documents the topic model is fitted on: title + newline + abstract"""
+    return (projects["title"].fillna("") + "\n" + projects["objective"].fillna("")).tolist()
+
+
+def text_key(model_id: str, text: str) -> bytes:
+    """Content address of one embedding: the model id and the exact input text"""
+    return hashlib.sha1(f"{model_id}\0{text}".encode("utf-8")).digest()
+
+
+def model_cache_dir(cache_dir: str, model_id: str) -> str:
+    return os.path.join(cache_dir, re.sub(r"[^\w.-]+", "_", model_id))
+
+
+def load_cache_index(model_dir: str) -> dict:
+    """Map every cached key to the shard file and row holding its vector"""
+    index = {}
+    for path in sorted(glob.glob(os.path.join(model_dir, "shard-*.safetensors"))):
+        with safe_open(path, framework="numpy") as f:
+            keys = f.get_tensor("keys")
+        for row, key in enumerate(keys):
+            index[key.tobytes()] = (path, row)
+    return index
+
+
+def write_shard(model_dir: str, keys: list, embeddings: np.ndarray) -> str:
+    """Persist one encoded batch; a shard is either complete on disk or absent"""
+    os.makedirs(model_dir, exist_ok=True)
+    path = os.path.join(model_dir, f"shard-{time.time_ns()}-{os.getpid()}.safetensors")
+    tmp_path = f"{path}.tmp"
+    save_file(
+        {
+            "keys": np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(len(keys), -1),
+            "embeddings": np.ascontiguousarray(embeddings, dtype=np.float32),
+        },
+        tmp_path,
+    )
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_embeddings(index: dict, keys: list) -> np.ndarray:
+    """Gather vectors for `keys`, opening each shard that holds any of them once"""
+    locations = [index[key] for key in keys]
+    by_shard = {}
+    for position, (path, row) in enumerate(locations):
+        by_shard.setdefault(path, ([], []))
+        by_shard[path][0].append(position)
+        by_shard[path][1].append(row)
+
+    embeddings = None
+    for path, (positions, rows) in by_shard.items():
+        with safe_open(path, framework="numpy") as f:
+            vectors = f.get_tensor("embeddings")
+        if embeddings is None:
+            embeddings = np.empty((len(keys), vectors.shape[1]), dtype=np.float32)
+        embeddings[positions] = vectors[rows]
+    return embeddings if embeddings is not None else np.empty((0, 0), dtype=np.float32)
+
+
+def sentence_transformer_encoder(model_id: str):
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_id, trust_remote_code=True)
+    return model.encode
+
+
+def embed_texts(
+    texts: list,
+    model_id: str = EMBEDDING_MODEL,
+    cache_dir: str = CACHE_DIR,
+    encode=None,
+    batch_size: int = 512,
+) -> np.ndarray:
+    """
+    Embed `texts` through a content-addressed cache. Only texts whose
+    (model, text) key is not cached are encoded, `batch_size` at a time, and
+    every batch is written as its own shard before the next one starts, so an
+    interrupted run resumes where it stopped. `encode` defaults to the
+    sentence-transformers model named by `model_id`.
+    """
+    model_dir = model_cache_dir(cache_dir, model_id)
+    keys = [text_key(model_id, text) for text in texts]
+    index = load_cache_index(model_dir)
+
+    misses = {}
+    for key, text in zip(keys, texts):
+        if key not in index:
+            misses.setdefault(key, text)
+    print(f"{sum(key in index for key in keys)}/{len(texts)} embeddings cached, {len(misses)} to encode")
+
+    if misses:
+        encode = encode or sentence_transformer_encoder(model_id)
+        miss_keys, miss_texts = list(misses), list(misses.values())
+        start = time.perf_counter()
+        for batch_start in range(0, len(miss_keys), batch_size):
+            batch_keys = miss_keys[batch_start:batch_start + batch_size]
+            vectors = np.asarray(encode(miss_texts[batch_start:batch_start + batch_size]))
+            path = write_shard(model_dir, batch_keys, vectors)
+            index.update({key: (path, row) for row, key in enumerate(batch_keys)})
+            done = batch_start + len(batch_keys)
+            print(f"Encoded {done}/{len(miss_keys)} ({done / (time.perf_counter() - start):.1f} docs/s)")
+
+    return read_embeddings(index, keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed project texts through the on-disk embedding cache")
+    parser.add_argument("--projects", default="data/interim/health.csv", help="Filtered health projects CSV")
+    parser.add_argument("--output", default="data/processed/embeddings.safetensors")
+    parser.add_argument("--model-name", default=EMBEDDING_MODEL)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--batch-size", type=int, default=512, help="Texts per checkpointed shard")
+    parser.add_argument("--workers", type=int, default=0, help="Encoder processes; 0 encodes in-process")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16", "int8"],
+                        help="Storage type of the output file; int8 adds per-dimension scales")
+    args = parser.parse_args()
+
+    encode = None
+    if args.workers:
+        from pipeline.encode import parallel_encoder
+
+        encode = parallel_encoder(args.model_name, args.workers, args.threads_per_worker)
+
+    projects = pd.read_csv(args.projects)
+    projects = projects[projects["status"] != "TERMINATED"]
+    embeddings = embed_texts(
+        project_texts(projects), args.model_name, args.cache_dir, encode=encode, batch_size=args.batch_size
+    )
+    write_store(args.output, embeddings, args.dtype)
+
+
+if __name__ == "__main__":
+    main()
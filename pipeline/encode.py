@@ -0,0 +1,143 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from pipeline.embed import EMBEDDING_MODEL, project_texts
+
+# Model loaded once per worker process by init_worker
+_model = None
+
+
+def init_worker(model_id: str, threads: int):
+    global _model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _model = SentenceTransformer(model_id, device="cpu", trust_remote_code=True)
+
+
+def encode_batch(texts: list) -> np.ndarray:
+    return _model.encode(texts, batch_size=len(texts), show_progress_bar=False, convert_to_numpy=True)
+
+
+@lru_cache(maxsize=4)
+def load_tokenizer(model_id: str):
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(model_id, trust_remote_code=True)
+
+
+def token_lengths(model_id: str, texts: list, max_length: int = 512) -> np.ndarray:
+    """Token count of every text with the checkpoint's own tokenizer, capped at the model's max length"""
+    encoded = load_tokenizer(model_id)(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+    return np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int64)
+
+
+def length_batches(lengths: np.ndarray, batch_size: int = 64, max_tokens: int = 16384) -> list:
+    """
+    Group text indices of similar length, longest first. A batch is closed
+    once it holds `batch_size` texts or its padded size (texts x longest
+    text) would exceed `max_tokens`, so padding stays small and long
+    abstracts do not blow up memory.
+    """
+    order = np.argsort(-lengths, kind="stable")
+    batches, batch = [], []
+    for index in order:
+        if batch and (len(batch) >= batch_size or (len(batch) + 1) * lengths[batch[0]] > max_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def encoder_pool(model_id: str = EMBEDDING_MODEL, workers: int = None, threads_per_worker: int = 1) -> ProcessPoolExecutor:
+    """Worker processes with the model loaded; spawn avoids forking an initialized torch runtime"""
+    workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(model_id, threads_per_worker),
+    )
+
+
+def encode_texts(
+    texts: list,
+    model_id: str = EMBEDDING_MODEL,
+    workers: int = None,
+    threads_per_worker: int = 1,
+    batch_size: int = 64,
+    max_tokens: int = 16384,
+    executor: ProcessPoolExecutor = None,
+) -> np.ndarray:
+    """
+    Encode `texts` on CPU across a process pool. Inputs are bucketed by
+    token length, batches are dispatched longest first so workers finish
+    together, and the embeddings are returned in the original order.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    start = time.perf_counter()
+    batches = length_batches(token_lengths(model_id, texts), batch_size, max_tokens)
+    own_executor = executor is None
+    if own_executor:
+        executor = encoder_pool(model_id, workers, threads_per_worker)
+
+    embeddings = None
+    try:
+        futures = {executor.submit(encode_batch, [texts[i] for i in batch]): batch for batch in batches}
+        for done, future in enumerate(as_completed(futures), start=1):
+            vectors = future.result()
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            embeddings[futures[future]] = vectors
+            if done % 10 == 0 or done == len(batches):
+                print(f"Encoded {done}/{len(batches)} batches")
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    print(f"Encoded {len(texts)} texts in {elapsed:.1f}s ({len(texts) / elapsed:.1f} docs/s)")
+    return embeddings
+
+
+def parallel_encoder(model_id: str = EMBEDDING_MODEL, workers: int = None, threads_per_worker: int = 1, **kwargs):
+    """An `encode` callable for pipeline.embed.embed_texts that keeps one pool across cache batches"""
+    executor = encoder_pool(model_id, workers, threads_per_worker)
+
+    def encode(texts: list) -> np.ndarray:
+        return encode_texts(texts, model_id, executor=executor, **kwargs)
+
+    return encode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the length-bucketed CPU encoder")
+    parser.add_argument("--projects", default="data/interim/health.csv", help="Filtered health projects CSV")
+    parser.add_argument("--model-name", default=EMBEDDING_MODEL, help="Hub id or path of a local sentence-transformers checkpoint")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-tokens", type=int, default=16384)
+    parser.add_argument("--limit", type=int, default=None, help="Only encode the first N projects")
+    args = parser.parse_args()
+
+    projects = pd.read_csv(args.projects)
+    projects = projects[projects["status"] != "TERMINATED"]
+    texts = project_texts(projects)[:args.limit]
+    encode_texts(texts, args.model_name, args.workers, args.threads_per_worker, args.batch_size, args.max_tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from safetensors.numpy import save_file
+from scipy.cluster import hierarchy as sch
+from scipy.spatial.distance import pdist
+
+from health.utils.ctfidf_utils import load_ctfidf_model, load_topic_info
+from health.utils.embedding_utils import open_store, read_rows
+
+
+def topic_vectors(model_dir: str, source: str = "ctfidf") -> np.ndarray:
+    """One row per non-outlier topic from the c-TF-IDF matrix or the topic embeddings"""
+    outliers = load_topic_info(model_dir)["outliers"]
+    if source == "ctfidf":
+        return load_ctfidf_model(model_dir)["ctfidf"][outliers:].toarray()
+    if source == "embeddings":
+        path = os.path.join(model_dir, "topic_embeddings.safetensors")
+        return read_rows(open_store(path, "topic_embeddings"), start=outliers)
+    raise ValueError(f"Unknown hierarchy source: {source}")
+
+
+def compute_topic_hierarchy(model_dir: str, source: str = "ctfidf") -> np.ndarray:
+    """
+    Ward linkage over the cosine distances between topics, as BERTopic's
+    hierarchical_topics does. Leaf i of the linkage is topic i.
+    """
+    distances = np.clip(pdist(topic_vectors(model_dir, source), metric="cosine"), 0, None)
+    return sch.linkage(distances, "ward", optimal_ordering=True)
+
+
+def save_topic_hierarchy(linkage: np.ndarray, path: str, source: str = "ctfidf"):
+    save_file({"linkage": np.ascontiguousarray(linkage, dtype=np.float64)}, path, metadata={"source": source})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the topic hierarchy for the app's dendrogram")
+    parser.add_argument("--model-dir", default="data/processed/model_dir")
+    parser.add_argument("--output", default="data/processed/topic_hierarchy.safetensors")
+    parser.add_argument("--source", default="ctfidf", choices=["ctfidf", "embeddings"])
+    args = parser.parse_args()
+
+    linkage = compute_topic_hierarchy(args.model_dir, args.source)
+    save_topic_hierarchy(linkage, args.output, args.source)
+    print(json.dumps({"topics": len(linkage) + 1, "max_distance": float(linkage[-1, 2])}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from health.utils.ctfidf_utils import load_ctfidf_model, score_texts
+from pipeline.assign import TOPIC_COLUMNS
+
+# c-TF-IDF model loaded once per worker process by init_worker
+_model = None
+
+
+def init_worker(model_dir: str):
+    global _model
+    _model = load_ctfidf_model(model_dir)
+
+
+def reassign_chunk(texts: list, threshold: float) -> np.ndarray:
+    """
+    Nearest non-outlier topic of each text by c-TF-IDF cosine similarity,
+    or -1 when no topic reaches `threshold` (BERTopic's "c-tf-idf" strategy).
+    """
+    topic_ids = _model["topic_ids"]
+    scores = score_texts(_model, texts)[:, topic_ids >= 0]
+    scores[scores < threshold] = 0
+    best = scores.argmax(axis=1)
+    return np.where(scores.max(axis=1) > 0, topic_ids[topic_ids >= 0][best], -1)
+
+
+def reduce_outliers(
+    texts: list,
+    topics,
+    model_dir: str,
+    threshold: float = 0.2,
+    chunk_size: int = 2000,
+    workers: int = None,
+) -> np.ndarray:
+    """
+    Reassign the -1 documents to topics. Only outlier texts are scored; they
+    are split into chunks, each turned into a sparse document-term matrix and
+    multiplied by the normalized topic x term c-TF-IDF matrix on a process
+    pool. Returns the full topic column with outliers replaced where possible.
+    """
+    topics = np.asarray(topics, dtype=np.int64).copy()
+    outliers = np.flatnonzero(topics == -1)
+    if len(outliers) == 0:
+        return topics
+
+    start = time.perf_counter()
+    chunks = [outliers[i:i + chunk_size] for i in range(0, len(outliers), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(model_dir,),
+    ) as executor:
+        results = executor.map(reassign_chunk, [[texts[i] for i in chunk] for chunk in chunks], [threshold] * len(chunks))
+        for chunk, new_topics in zip(chunks, results):
+            topics[chunk] = new_topics
+
+    remaining = int((topics == -1).sum())
+    print(f"Reassigned {len(outliers) - remaining}/{len(outliers)} outliers "
+          f"in {time.perf_counter() - start:.1f}s ({len(chunks)} chunks, {workers} workers)")
+    return topics
+
+
+def reassign_outliers(
+    topic_df: pd.DataFrame,
+    model_dir: str,
+    threshold: float = 0.2,
+    chunk_size: int = 2000,
+    workers: int = None,
+) -> pd.DataFrame:
+    """topic_df with its outliers reassigned and the per-topic columns and Count refreshed"""
+    texts = (topic_df["title"].fillna("") + "\n" + topic_df["abstract"].fillna("")).tolist()
+    topics = reduce_outliers(texts, topic_df["topic"], model_dir, threshold, chunk_size, workers)
+
+    # Reassigned projects take the label and keywords of their new topic
+    topic_meta = topic_df.drop_duplicates("topic").set_index("topic")[TOPIC_COLUMNS]
+    columns = topic_df.columns
+    topic_df = topic_df.drop(columns=TOPIC_COLUMNS).assign(topic=topics).join(topic_meta, on="topic")
+    topic_df["Count"] = topic_df["topic"].map(topic_df["topic"].value_counts())
+    return topic_df[columns]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reassign outlier projects to topics by c-TF-IDF similarity")
+    parser.add_argument("--topic-df", default="data/processed/topic_df.csv")
+    parser.add_argument("--model-dir", default="data/processed/model_dir")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    topic_df = reassign_outliers(
+        pd.read_csv(args.topic_df), args.model_dir, args.threshold, args.chunk_size, args.workers
+    )
+    tmp_path = f"{args.topic_df}.{os.getpid()}.tmp"
+    topic_df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, args.topic_df)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import argparse
+import copy
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import time
+
+import pandas as pd
+
+from pipeline.embed import EMBEDDING_MODEL
+from pipeline.similarity import SIMILARITY_MODEL
+from pipeline.stages import (
+    cluster_projects,
+    embed_projects,
+    export_app_data,
+    filter_projects,
+    merge_organisations,
+    reduce_projects,
+    reduce_topic_outliers,
+    represent_topics,
+    topic_hierarchy,
+    topic_similarity,
+)
+
+STATE_DIR = "data/cache/pipeline"
+APP_DATA_DIR = "health/data"
+
+# Declared in dependency order; a stage depends on the stages whose outputs it reads.
+# `code` lists the modules a stage calls into, so editing them invalidates it.
+STAGES = {
+    "filter": {
+        "run": filter_projects,
+        "code": [],
+        "inputs": {"projects": "data/raw/project.xlsx", "euroscivoc": "data/raw/euroSciVoc.xlsx"},
+        "outputs": {"health": "data/interim/health.csv"},
+        "params": {"field_path": "/medical and health sciences", "exclude_status": ["TERMINATED"]},
+    },
+    "merge": {
+        "run": merge_organisations,
+        "code": [],
+        "inputs": {
+            "health": "data/interim/health.csv",
+            "organisations": "data/raw/organization.xlsx",
+            "publications": "data/raw/projectPublications.xlsx",
+        },
+        "outputs": {
+            "orgs": "data/processed/health_orgs.csv",
+            "orgs_pub": "data/processed/health_orgs_pub.csv",
+            "publication_counts": "data/interim/publication_counts.csv",
+        },
+        "params": {},
+    },
+    "embed": {
+        "run": embed_projects,
+        "code": ["pipeline.embed", "pipeline.encode", "health.utils.embedding_utils"],
+        "inputs": {"health": "data/interim/health.csv"},
+        "outputs": {"embeddings": "data/processed/embeddings.safetensors"},
+        "params": {"model_name": EMBEDDING_MODEL, "workers": 0, "threads_per_worker": 1, "dtype": "float32"},
+    },
+    "reduce": {
+        "run": reduce_projects,
+        "code": ["pipeline.sweep", "health.utils.embedding_utils"],
+        "inputs": {"embeddings": "data/processed/embeddings.safetensors"},
+        "outputs": {
+            "reduced": "data/processed/5comp_embeddings.safetensors",
+            "map": "data/processed/2comp_embeddings.safetensors",
+        },
+        "params": {
+            "cluster_umap": {"n_neighbors": 15, "n_components": 5, "min_dist": 0.0},
+            "map_umap": {"n_neighbors": 15, "n_components": 2, "min_dist": 0.0},
+        },
+    },
+    "cluster": {
+        "run": cluster_projects,
+        "code": ["health.utils.embedding_utils"],
+        "inputs": {"reduced": "data/processed/5comp_embeddings.safetensors"},
+        "outputs": {"clusters": "data/interim/clusters.safetensors"},
+        "params": {"hdbscan": {"min_cluster_size": 25, "cluster_selection_method": "eom"}},
+    },
+    "represent": {
+        "run": represent_topics,
+        "code": ["pipeline.embed", "health.utils.embedding_utils"],
+        "inputs": {
+            "health": "data/interim/health.csv",
+            "embeddings": "data/processed/embeddings.safetensors",
+            "clusters": "data/interim/clusters.safetensors",
+            "publication_counts": "data/interim/publication_counts.csv",
+        },
+        "outputs": {"model_dir": "data/processed/model_dir", "topic_df": "data/interim/topic_df_raw.csv"},
+        "params": {
+            "model_name": EMBEDDING_MODEL,
+            "extra_stopwords": ["project", "health", "research", "medical"],
+            "min_df": 2,
+            "ngram_range": [1, 2],
+            "mmr_diversity": 0.2,
+            "pos_model": "en_core_sci_lg",
+            "labels": None,
+        },
+    },
+    "outliers": {
+        "run": reduce_topic_outliers,
+        "code": ["pipeline.outliers", "health.utils.ctfidf_utils"],
+        "inputs": {"topic_df": "data/interim/topic_df_raw.csv", "model_dir": "data/processed/model_dir"},
+        "outputs": {"topic_df": "data/processed/topic_df.csv"},
+        "params": {"threshold": 0.2, "chunk_size": 2000, "workers": None},
+    },
+    "similarity": {
+        "run": topic_similarity,
+        "code": ["pipeline.similarity", "pipeline.embed"],
+        "inputs": {"topic_df": "data/processed/topic_df.csv"},
+        "outputs": {
+            "similarity": "data/processed/topic_similarity.safetensors",
+            "alignment": "data/processed/euscivoc_similarity.csv",
+        },
+        "params": {"model_name": SIMILARITY_MODEL},
+    },
+    "hierarchy": {
+        "run": topic_hierarchy,
+        "code": ["pipeline.hierarchy", "health.utils.ctfidf_utils", "health.utils.embedding_utils"],
+        "inputs": {"model_dir": "data/processed/model_dir"},
+        "outputs": {"hierarchy": "data/processed/topic_hierarchy.safetensors"},
+        "params": {"source": "ctfidf"},
+    },
+    "export": {
+        "run": export_app_data,
+        "code": [],
+        "inputs": {
+            "fund": "data/processed/FundsGDPhealth_export.csv",
+            "topic_df": "data/processed/topic_df.csv",
+            "orgs": "data/processed/health_orgs.csv",
+            "orgs_pub": "data/processed/health_orgs_pub.csv",
+            "reduced": "data/processed/5comp_embeddings.safetensors",
+            "map": "data/processed/2comp_embeddings.safetensors",
+            "model_dir": "data/processed/model_dir",
+            "similarity": "data/processed/topic_similarity.safetensors",
+            "hierarchy": "data/processed/topic_hierarchy.safetensors",
+        },
+        "outputs": {
+            "fund": f"{APP_DATA_DIR}/FundsGDPhealth_export.csv",
+            "topic_df": f"{APP_DATA_DIR}/topic_df.csv",
+            "orgs": f"{APP_DATA_DIR}/health_orgs.csv",
+            "orgs_pub": f"{APP_DATA_DIR}/health_orgs_pub.csv",
+            "reduced": f"{APP_DATA_DIR}/5comp_embeddings.safetensors",
+            "map": f"{APP_DATA_DIR}/2comp_embeddings.safetensors",
+            "model_dir": f"{APP_DATA_DIR}/model_dir",
+            "similarity": f"{APP_DATA_DIR}/topic_similarity.safetensors",
+            "hierarchy": f"{APP_DATA_DIR}/topic_hierarchy.safetensors",
+        },
+        "params": {},
+    },
+}
+
+
+def load_state(name: str) -> dict:
+    path = os.path.join(STATE_DIR, f"{name}.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(name: str, state: dict):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    path = os.path.join(STATE_DIR, f"{name}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_digest(path: str, known: dict) -> str:
+    """Content hash of a file, reused while its size and mtime are unchanged"""
+    stat = os.stat(path)
+    stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+    if known.get(path, {}).get("stamp") == stamp:
+        return known[path]["digest"]
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    known[path] = {"stamp": stamp, "digest": digest.hexdigest()}
+    return known[path]["digest"]
+
+
+def path_digest(path: str, known: dict) -> str:
+    """Digest of a file, or of every file (and its relative path) under a directory"""
+    if not os.path.isdir(path):
+        return file_digest(path, known)
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for filename in sorted(files):
+            file_path = os.path.join(root, filename)
+            digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+            digest.update(file_digest(file_path, known).encode("ascii"))
+    return digest.hexdigest()
+
+
+def code_digest(stage: dict, known: dict) -> str:
+    """Hash of the stage function and the source files of the modules in its `code` list"""
+    digest = hashlib.sha1(inspect.getsource(stage["run"]).encode("utf-8"))
+    for module in sorted(stage.get("code", [])):
+        spec = importlib.util.find_spec(module)
+        if spec is None or spec.origin is None:
+            raise ModuleNotFoundError(f"stage code module {module} not found")
+        digest.update(module.encode("utf-8"))
+        digest.update(file_digest(spec.origin, known).encode("ascii"))
+    return digest.hexdigest()
+
+
+def stage_key(name: str, stage: dict, params: dict, known: dict) -> str:
+    """Hash of a stage's code, parameters and input contents"""
+    key = {
+        "stage": name,
+        "code": code_digest(stage, known),
+        "params": params,
+        "inputs": {input_name: path_digest(path, known) for input_name, path in stage["inputs"].items()},
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def upstream(targets: list) -> list:
+    """The target stages and every stage producing one of their inputs, in declared order"""
+    producers = {path: name for name, stage in STAGES.items() for path in stage["outputs"].values()}
+    needed, queue = set(), list(targets)
+    while queue:
+        name = queue.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        queue.extend(producers[path] for path in STAGES[name]["inputs"].values() if path in producers)
+    return [name for name in STAGES if name in needed]
+
+
+def parse_overrides(overrides: list) -> dict:
+    """`stage.param=value` pairs; values are parsed as JSON when possible"""
+    params = {}
+    for override in overrides:
+        target, value = override.split("=", 1)
+        stage, param = target.split(".", 1)
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+        params.setdefault(stage, {})[param] = value
+    return params
+
+
+def run_pipeline(targets: list = None, overrides: dict = None, force: bool = False) -> pd.DataFrame:
+    """
+    Run the target stages (all by default) and their upstream stages. A stage
+    is skipped when the hash of its code, parameters and inputs matches its
+    last successful run and its outputs are unchanged since then.
+    """
+    targets = targets or list(STAGES)
+    overrides = overrides or {}
+    known = load_state("_digests")
+    timings = []
+    for name in upstream(targets):
+        stage = STAGES[name]
+        params = {**copy.deepcopy(stage["params"]), **overrides.get(name, {})}
+        start = time.perf_counter()
+
+        key = stage_key(name, stage, params, known)
+        state = load_state(name)
+        outputs_current = all(os.path.exists(path) for path in stage["outputs"].values()) and state.get("outputs") == {
+            output: path_digest(path, known) for output, path in stage["outputs"].items()
+        }
+        if not (force and name in targets) and state.get("key") == key and outputs_current:
+            timings.append({"stage": name, "status": "cached", "seconds": time.perf_counter() - start})
+            print(f"[{name}] up to date")
+            continue
+
+        print(f"[{name}] running")
+        stage["run"](stage["inputs"], stage["outputs"], params)
+        save_state(name, {
+            "key": key,
+            "params": params,
+            "outputs": {output: path_digest(path, known) for output, path in stage["outputs"].items()},
+        })
+        save_state("_digests", known)
+        seconds = time.perf_counter() - start
+        timings.append({"stage": name, "status": "ran", "seconds": seconds})
+        print(f"[{name}] done in {seconds:.1f}s")
+
+    save_state("_digests", known)
+    return pd.DataFrame(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the app's data artefacts from the raw CORDIS exports")
+    parser.add_argument("stages", nargs="*", help=f"Stages to bring up to date (default: all): {', '.join(STAGES)}")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="STAGE.PARAM=VALUE",
+                        help="Override a stage parameter, e.g. --set cluster.hdbscan='{\"min_cluster_size\": 30}'")
+    parser.add_argument("--force", action="store_true", help="Re-run the named stages even if up to date")
+    args = parser.parse_args()
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    timings = run_pipeline(args.stages, parse_overrides(args.overrides), args.force)
+    print(timings.to_string(index=False, float_format="%.1f"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import ast
+import json
+
+import numpy as np
+import pandas as pd
+from safetensors.numpy import save_file
+
+from pipeline.embed import CACHE_DIR, embed_texts
+
+SIMILARITY_MODEL = "sentence-transformers/all-mpnet-base-v2"
+
+
+def parse_keywords(value) -> list:
+    """A keyword list stored as its Python repr in topic_df.csv"""
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        return []
+    try:
+        parsed = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return [word.strip() for word in value.split(",") if word.strip()]
+    return list(parsed) if isinstance(parsed, (list, tuple)) else [str(parsed)]
+
+
+def topic_keywords(topic_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per topic with its label, POS keywords and the de-duplicated
+    EuroSciVoc field titles of its projects, parsed in a single pass.
+    """
+    topic_df = topic_df[topic_df["topic"] >= 0]
+    fields = topic_df["euroSciVocTitle"].map(parse_keywords).groupby(topic_df["topic"]).agg(
+        lambda lists: list(dict.fromkeys(field for titles in lists for field in titles))
+    )
+    first = topic_df.drop_duplicates("topic").set_index("topic").sort_index()
+    return pd.DataFrame({
+        "topic_label": first["topic_label"],
+        "pos": first["POS"].map(parse_keywords),
+        "fields": fields,
+    })
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def compute_topic_similarity(topic_df: pd.DataFrame, model_id: str = SIMILARITY_MODEL,
+                             cache_dir: str = CACHE_DIR, encode=None) -> dict:
+    """
+    Encode every topic's keywords, its EuroSciVoc profile and every distinct
+    EuroSciVoc field in one batched call, then compute topic x topic and
+    topic x field cosine similarities with one matmul each. `alignment` is
+    each topic's similarity to its own projects' fields (the former
+    euscivoc_similarity.csv score).
+    """
+    keywords = topic_keywords(topic_df)
+    fields = sorted({field for titles in keywords["fields"] for field in titles})
+    texts = (
+        [" ".join(words) for words in keywords["pos"]]
+        + [" ".join(titles) for titles in keywords["fields"]]
+        + fields
+    )
+    vectors = l2_normalize(embed_texts(texts, model_id, cache_dir, encode=encode))
+
+    n_topics = len(keywords)
+    topic_vectors = vectors[:n_topics]
+    profile_vectors = vectors[n_topics:2 * n_topics]
+    field_vectors = vectors[2 * n_topics:]
+    return {
+        "topics": keywords.index.to_numpy(dtype=np.int64),
+        "labels": keywords["topic_label"].tolist(),
+        "fields": fields,
+        "topic_topic": (topic_vectors @ topic_vectors.T).astype(np.float32),
+        "topic_field": (topic_vectors @ field_vectors.T).astype(np.float32),
+        "alignment": np.einsum("ij,ij->i", topic_vectors, profile_vectors).astype(np.float32),
+    }
+
+
+def save_topic_similarity(similarity: dict, path: str):
+    """Matrices as tensors, topic labels and field titles as JSON metadata"""
+    save_file(
+        {name: similarity[name] for name in ("topics", "topic_topic", "topic_field", "alignment")},
+        path,
+        metadata={"labels": json.dumps(similarity["labels"]), "fields": json.dumps(similarity["fields"])},
+    )
+
+
+def alignment_table(similarity: dict) -> pd.DataFrame:
+    return pd.DataFrame({
+        "topic": similarity["topics"],
+        "topic_label": similarity["labels"],
+        "cosine_similarity": similarity["alignment"],
+    }).sort_values("cosine_similarity", ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Topic x topic and topic x EuroSciVoc similarity matrices")
+    parser.add_argument("--topic-df", default="data/processed/topic_df.csv")
+    parser.add_argument("--output", default="data/processed/topic_similarity.safetensors")
+    parser.add_argument("--alignment-output", default="data/processed/euscivoc_similarity.csv")
+    parser.add_argument("--model-name", default=SIMILARITY_MODEL)
+    args = parser.parse_args()
+
+    topic_df = pd.read_csv(args.topic_df, usecols=["topic", "topic_label", "POS", "euroSciVocTitle"])
+    similarity = compute_topic_similarity(topic_df, args.model_name)
+    save_topic_similarity(similarity, args.output)
+    alignment_table(similarity).to_csv(args.alignment_output, index=False)
+
+
+if __name__ == "__main__":
+    main()
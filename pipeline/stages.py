@@ -0,0 +1,213 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from safetensors.numpy import load_file, save_file
+
+from health.utils.embedding_utils import open_store, read_rows, write_store
+from pipeline.embed import embed_texts, project_texts
+from pipeline.hierarchy import compute_topic_hierarchy, save_topic_hierarchy
+from pipeline.outliers import reassign_outliers
+from pipeline.similarity import alignment_table, compute_topic_similarity, save_topic_similarity
+from pipeline.sweep import reduce_embeddings
+
+# Each stage reads the paths in `inputs`, writes the paths in `outputs` and
+# is configured by `params`; pipeline.run decides when a stage is stale.
+
+EUROPEAN_COUNTRIES = {
+    "BE": "Belgium", "BG": "Bulgaria", "CZ": "Czechia", "DK": "Denmark", "DE": "Germany",
+    "EE": "Estonia", "IE": "Ireland", "GR": "Greece", "ES": "Spain", "FR": "France",
+    "HR": "Croatia", "IT": "Italy", "CY": "Cyprus", "LV": "Latvia", "LT": "Lithuania",
+    "LU": "Luxembourg", "HU": "Hungary", "MT": "Malta", "NL": "Netherlands", "AT": "Austria",
+    "PL": "Poland", "PT": "Portugal", "RO": "Romania", "SI": "Slovenia", "SK": "Slovakia",
+    "FI": "Finland", "SE": "Sweden", "IS": "Iceland", "LI": "Liechtenstein", "NO": "Norway",
+    "CH": "Switzerland", "GB": "United Kingdom", "BA": "Bosnia and Herzegovina",
+    "ME": "Montenegro", "MK": "North Macedonia", "AL": "Albania", "RS": "Serbia",
+    "TR": "Türkiye", "UA": "Ukraine", "NULL": "Kosovo",
+}
+
+
+def write_csv(df: pd.DataFrame, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def filter_projects(inputs: dict, outputs: dict, params: dict):
+    """Projects with a EuroSciVoc field under the health path (prep.ipynb)"""
+    project = pd.read_excel(inputs["projects"])
+    euroscivoc = pd.read_excel(inputs["euroscivoc"])
+
+    # One project may belong to several fields
+    fields = euroscivoc.groupby("projectID")[["euroSciVocCode", "euroSciVocPath", "euroSciVocTitle"]].agg(list)
+    projects = project.merge(fields, left_on="id", right_index=True, how="left")
+    projects["projectID"] = projects["id"]
+
+    is_health = projects["euroSciVocPath"].map(
+        lambda paths: isinstance(paths, list) and any(params["field_path"] in path for path in paths)
+    )
+    projects = projects[is_health & ~projects["status"].isin(params["exclude_status"])]
+    write_csv(projects, outputs["health"])
+
+
+def merge_organisations(inputs: dict, outputs: dict, params: dict):
+    """European participants of health projects, and coordinators with publication counts (network.ipynb)"""
+    health_ids = pd.read_csv(inputs["health"], usecols=["projectID"])["projectID"].unique()
+    orgs = pd.read_excel(inputs["organisations"])
+    orgs = orgs[orgs["projectID"].isin(health_ids) & orgs["country"].isin(list(EUROPEAN_COUNTRIES))]
+    orgs = orgs.assign(country_name=orgs["country"].map(EUROPEAN_COUNTRIES))
+    write_csv(orgs, outputs["orgs"])
+
+    publications = pd.read_excel(inputs["publications"], usecols=["projectID"])
+    counts = publications.groupby("projectID").size().rename("publicationCount").reset_index()
+    write_csv(counts, outputs["publication_counts"])
+
+    coordinators = orgs[orgs["role"].str.lower() == "coordinator"]
+    write_csv(coordinators.merge(counts, on="projectID", how="left"), outputs["orgs_pub"])
+
+
+def embed_projects(inputs: dict, outputs: dict, params: dict):
+    """Full-size document embeddings, encoded through the embedding cache"""
+    encode = None
+    if params["workers"]:
+        from pipeline.encode import parallel_encoder
+
+        encode = parallel_encoder(params["model_name"], params["workers"], params["threads_per_worker"])
+
+    projects = pd.read_csv(inputs["health"])
+    embeddings = embed_texts(project_texts(projects), params["model_name"], encode=encode)
+    write_store(outputs["embeddings"], embeddings, params["dtype"])
+
+
+def reduce_projects(inputs: dict, outputs: dict, params: dict):
+    """UMAP reductions for clustering (5D) and for the datamap (2D)"""
+    reduce_embeddings(inputs["embeddings"], params["cluster_umap"], outputs["reduced"])
+    reduce_embeddings(inputs["embeddings"], params["map_umap"], outputs["map"])
+
+
+def cluster_projects(inputs: dict, outputs: dict, params: dict):
+    from hdbscan import HDBSCAN
+
+    reduced = read_rows(open_store(inputs["reduced"]))
+    labels = HDBSCAN(metric="euclidean", **params["hdbscan"]).fit(reduced).labels_
+    print(f"{labels.max() + 1} clusters, {(labels == -1).mean():.1%} outliers")
+    save_file({"labels": labels.astype(np.int64)}, outputs["clusters"])
+
+
+def topic_labels(topic_model, labels_path: str = None) -> dict:
+    """Curated labels from a JSON file of {topic: label}, else the top words"""
+    if labels_path:
+        with open(labels_path, encoding="utf-8") as f:
+            return {int(topic): label for topic, label in json.load(f).items()}
+    return {
+        topic: f"{topic}-" + " ".join(word.title() for word, _ in topic_model.get_topic(topic)[:4])
+        for topic in topic_model.get_topics()
+        if topic != -1
+    }
+
+
+def represent_topics(inputs: dict, outputs: dict, params: dict):
+    """
+    Fit the BERTopic representations on the precomputed embeddings and
+    clusters and build topic_df (topic_model.ipynb and topic_analysis.ipynb).
+    Outliers stay at -1 here; the outliers stage reassigns them.
+    """
+    from bertopic import BERTopic
+    from bertopic.cluster import BaseCluster
+    from bertopic.dimensionality import BaseDimensionalityReduction
+    from bertopic.representation import KeyBERTInspired, MaximalMarginalRelevance, PartOfSpeech
+    from nltk.corpus import stopwords
+    from sentence_transformers import SentenceTransformer
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    projects = pd.read_csv(inputs["health"])
+    texts = project_texts(projects)
+    embeddings = read_rows(open_store(inputs["embeddings"]))
+    clusters = load_file(inputs["clusters"])["labels"]
+
+    embedding_model = SentenceTransformer(params["model_name"], trust_remote_code=True)
+    vectorizer_model = CountVectorizer(
+        stop_words=stopwords.words("english") + params["extra_stopwords"],
+        min_df=params["min_df"],
+        ngram_range=tuple(params["ngram_range"]),
+    )
+    topic_model = BERTopic(
+        embedding_model=embedding_model,
+        umap_model=BaseDimensionalityReduction(),
+        hdbscan_model=BaseCluster(),
+        vectorizer_model=vectorizer_model,
+        representation_model={
+            "KeyBERT": KeyBERTInspired(),
+            "MMR": MaximalMarginalRelevance(diversity=params["mmr_diversity"]),
+            "POS": PartOfSpeech(params["pos_model"]),
+        },
+        top_n_words=10,
+        language="english",
+        verbose=True,
+    )
+    topic_model.fit(texts, embeddings=embeddings, y=clusters)
+
+    labels = topic_labels(topic_model, params["labels"])
+    topic_model.set_topic_labels(labels)
+    if os.path.exists(outputs["model_dir"]):
+        shutil.rmtree(outputs["model_dir"])
+    topic_model.save(outputs["model_dir"], serialization="safetensors", save_ctfidf=True,
+                     save_embedding_model=params["model_name"])
+
+    topic_df = pd.DataFrame({
+        "projectID": projects["projectID"],
+        "title": projects["title"],
+        "abstract": projects["objective"],
+        "topic": topic_model.topics_,
+        "euroSciVocTitle": projects["euroSciVocTitle"],
+        "ecSignatureDate": projects["ecSignatureDate"],
+        "totalCost": projects["totalCost"],
+        "ecMaxContribution": projects["ecMaxContribution"],
+    })
+    topic_df["topic_label"] = topic_df["topic"].map(labels)
+    info = topic_model.get_topic_info()[["Topic", "Count", "MMR", "KeyBERT", "POS"]]
+    topic_df = topic_df.merge(info, left_on="topic", right_on="Topic", how="left").drop(columns="Topic")
+
+    counts = pd.read_csv(inputs["publication_counts"]).rename(columns={"publicationCount": "publication_count"})
+    write_csv(topic_df.merge(counts, on="projectID", how="left"), outputs["topic_df"])
+
+
+def reduce_topic_outliers(inputs: dict, outputs: dict, params: dict):
+    """Reassign outlier projects by c-TF-IDF similarity to the fitted topics, on a process pool"""
+    topic_df = pd.read_csv(inputs["topic_df"])
+    topic_df = reassign_outliers(
+        topic_df, inputs["model_dir"], params["threshold"], params["chunk_size"], params["workers"]
+    )
+    write_csv(topic_df, outputs["topic_df"])
+
+
+def topic_similarity(inputs: dict, outputs: dict, params: dict):
+    """Topic x topic and topic x EuroSciVoc similarity matrices (topic_analysis.ipynb)"""
+    topic_df = pd.read_csv(inputs["topic_df"], usecols=["topic", "topic_label", "POS", "euroSciVocTitle"])
+    similarity = compute_topic_similarity(topic_df, params["model_name"])
+    save_topic_similarity(similarity, outputs["similarity"])
+    write_csv(alignment_table(similarity), outputs["alignment"])
+
+
+def topic_hierarchy(inputs: dict, outputs: dict, params: dict):
+    """Topic linkage for the dendrogram, so the app never loads BERTopic"""
+    linkage = compute_topic_hierarchy(inputs["model_dir"], params["source"])
+    save_topic_hierarchy(linkage, outputs["hierarchy"], params["source"])
+
+
+def export_app_data(inputs: dict, outputs: dict, params: dict):
+    """Copy the artefacts the Shiny app loads into its data directory"""
+    for name, source in inputs.items():
+        target = outputs[name]
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_target = f"{target}.{os.getpid()}.tmp"
+        if os.path.isdir(source):
+            shutil.copytree(source, tmp_target)
+            if os.path.exists(target):
+                shutil.rmtree(target)
+        else:
+            shutil.copy2(source, tmp_target)
+        os.replace(tmp_target, target)
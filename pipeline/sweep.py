@@ -0,0 +1,151 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from health.utils.embedding_utils import open_store, read_rows, write_store
+
+REDUCTION_CACHE_DIR = "data/cache/reductions"
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def reduction_path(cache_dir: str, embeddings_digest: str, umap_params: dict) -> str:
+    """Reductions are keyed by the embeddings content and the UMAP parameters"""
+    key = hashlib.sha1(f"{embeddings_digest}{json.dumps(umap_params, sort_keys=True)}".encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"umap-{key}.safetensors")
+
+
+def reduce_embeddings(embeddings_path: str, umap_params: dict, output_path: str) -> dict:
+    """Fit one UMAP configuration and cache the reduced embeddings"""
+    from umap import UMAP
+
+    start = time.perf_counter()
+    embeddings = read_rows(open_store(embeddings_path))
+    reduced = UMAP(metric="cosine", random_state=42, **umap_params).fit_transform(embeddings)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    write_store(output_path, reduced)
+    return {"umap_seconds": time.perf_counter() - start}
+
+
+def cluster_reduction(reduction_path: str, hdbscan_params: dict) -> dict:
+    """Fit one HDBSCAN configuration on a cached reduction and score it"""
+    from hdbscan import HDBSCAN
+
+    start = time.perf_counter()
+    reduced = read_rows(open_store(reduction_path)).astype(np.float64)
+    model = HDBSCAN(metric="euclidean", gen_min_span_tree=True, **hdbscan_params).fit(reduced)
+
+    labels = model.labels_
+    n_clusters = int(labels.max()) + 1
+    return {
+        "n_clusters": n_clusters,
+        "outlier_fraction": float((labels == -1).mean()),
+        "dbcv": float(model.relative_validity_) if n_clusters > 1 else np.nan,
+        "mean_persistence": float(np.mean(model.cluster_persistence_)) if n_clusters else np.nan,
+        "hdbscan_seconds": time.perf_counter() - start,
+    }
+
+
+def param_grid(**options) -> list:
+    """Every combination of the given parameter lists, as dicts"""
+    names = list(options)
+    return [dict(zip(names, values)) for values in itertools.product(*options.values())]
+
+
+def run_sweep(
+    embeddings_path: str,
+    umap_grid: list,
+    hdbscan_grid: list,
+    cache_dir: str = REDUCTION_CACHE_DIR,
+    workers: int = None,
+) -> pd.DataFrame:
+    """
+    Score every UMAP x HDBSCAN combination. Each UMAP configuration is fitted
+    once (or read from the reduction cache of an earlier sweep) and all
+    HDBSCAN settings for it are queued as soon as its reduction is ready, so
+    reductions and clusterings overlap across the process pool.
+    """
+    start = time.perf_counter()
+    digest = file_digest(embeddings_path)
+    workers = workers or os.cpu_count() or 1
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = {}
+
+        def queue_clustering(umap_params, path, umap_seconds):
+            for hdbscan_params in hdbscan_grid:
+                future = executor.submit(cluster_reduction, path, hdbscan_params)
+                pending[future] = ("cluster", umap_params, hdbscan_params, umap_seconds)
+
+        for umap_params in umap_grid:
+            path = reduction_path(cache_dir, digest, umap_params)
+            if os.path.exists(path):
+                queue_clustering(umap_params, path, 0.0)
+            else:
+                future = executor.submit(reduce_embeddings, embeddings_path, umap_params, path)
+                pending[future] = ("reduce", umap_params, path, None)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, umap_params, detail, umap_seconds = pending.pop(future)
+                if kind == "reduce":
+                    queue_clustering(umap_params, detail, future.result()["umap_seconds"])
+                    continue
+                scores = future.result()
+                results.append({
+                    **{f"umap_{name}": value for name, value in umap_params.items()},
+                    **{f"hdbscan_{name}": value for name, value in detail.items()},
+                    **scores,
+                    "umap_seconds": umap_seconds,
+                })
+                print(f"{len(results)}/{len(umap_grid) * len(hdbscan_grid)}: "
+                      f"{umap_params} {detail} -> {scores['n_clusters']} clusters")
+
+    print(f"Sweep finished in {time.perf_counter() - start:.1f}s")
+    return pd.DataFrame(results).sort_values("dbcv", ascending=False, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UMAP/HDBSCAN hyperparameter sweep over cached embeddings")
+    parser.add_argument("--embeddings", default="data/processed/embeddings.safetensors")
+    parser.add_argument("--output", default="data/processed/sweep_results.csv")
+    parser.add_argument("--cache-dir", default=REDUCTION_CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--n-neighbors", type=int, nargs="+", default=[15])
+    parser.add_argument("--n-components", type=int, nargs="+", default=[5])
+    parser.add_argument("--min-dist", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--min-cluster-size", type=int, nargs="+", default=[25])
+    parser.add_argument("--min-samples", type=int, nargs="+", default=[None])
+    parser.add_argument("--cluster-selection-method", nargs="+", default=["eom"], choices=["eom", "leaf"])
+    args = parser.parse_args()
+
+    umap_grid = param_grid(n_neighbors=args.n_neighbors, n_components=args.n_components, min_dist=args.min_dist)
+    hdbscan_grid = param_grid(
+        min_cluster_size=args.min_cluster_size,
+        min_samples=args.min_samples,
+        cluster_selection_method=args.cluster_selection_method,
+    )
+    results = run_sweep(args.embeddings, umap_grid, hdbscan_grid, args.cache_dir, args.workers)
+    results.to_csv(args.output, index=False)
+    print(results.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
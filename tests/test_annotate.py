@@ -0,0 +1,22 @@
+from types import SimpleNamespace
+
+from pipeline.annotate import entity_frequencies
+
+
+def doc(*entities):
+    return SimpleNamespace(ents=[SimpleNamespace(text=text) for text in entities])
+
+
+def test_entity_frequencies_match_the_notebook_sheets():
+    docs = [
+        doc("breast cancer", "T cells ", "cancer", "breast cancer"),
+        doc("influenza virus", "a very long entity of six words"),
+        doc("breast cancer", "T cells"),
+    ]
+    sheets = entity_frequencies(docs, [3, 1, 3], top_n=1)
+
+    assert list(sheets) == ["Topic_3", "Topic_1"]
+    assert list(sheets["Topic_3"].columns) == ["Entity", "Frequency"]
+    assert sheets["Topic_3"].values.tolist() == [["breast cancer", 3]]
+    # Single words and phrases over five words are skipped
+    assert sheets["Topic_1"].values.tolist() == [["influenza virus", 1]]
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import cache_utils
+from utils.cache_utils import data_cache, frame_version, normalize_arg, tag_frame
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    cache_utils.clear_cache()
+    yield
+    cache_utils.clear_cache()
+
+
+def tagged_frame():
+    df = pd.DataFrame({"a": [1, 2, 3, 4], "b": [4, 3, 2, 1], "c": [0, 0, 1, 1]})
+    return tag_frame(df, "table@v1")
+
+
+def test_projections_of_a_tagged_frame_get_different_keys():
+    df = tagged_frame()
+    assert normalize_arg(df[["a", "c"]]) != normalize_arg(df[["b", "c"]])
+
+
+def test_filters_of_a_tagged_frame_get_different_keys():
+    df = tagged_frame()
+    low, high = df[df["a"] <= 2], df[df["a"] > 2]
+    assert low.attrs["dataset_version"] == "table@v1"
+    assert frame_version(low) is None
+    assert normalize_arg(low) != normalize_arg(high)
+
+
+def test_tagged_frame_is_keyed_by_version():
+    assert normalize_arg(tagged_frame()) == normalize_arg(tagged_frame())
+    assert frame_version(tagged_frame()) == "table@v1"
+
+
+def test_cached_builder_does_not_mix_derived_frames():
+    calls = []
+
+    @data_cache()
+    def column_sum(data):
+        calls.append(1)
+        return int(data.to_numpy().sum())
+
+    df = tagged_frame()
+    assert column_sum(df[["a"]]) == 10
+    assert column_sum(df[["c"]]) == 2
+    assert column_sum(df[["a"]]) == 10
+    assert len(calls) == 2
+
+
+def test_untagged_frames_are_hashed_once(monkeypatch):
+    df = pd.DataFrame({"a": np.arange(10)})
+    hashes = []
+    original = pd.util.hash_pandas_object
+    monkeypatch.setattr(pd.util, "hash_pandas_object", lambda *a, **k: hashes.append(1) or original(*a, **k))
+    assert normalize_arg(df) == normalize_arg(df)
+    assert len(hashes) == 1
+
+
+def test_oversize_results_are_counted():
+    @data_cache()
+    def big(n):
+        return np.zeros(n)
+
+    bound = cache_utils._data.max_bytes
+    cache_utils._data.max_bytes = 1000
+    try:
+        big(10_000)
+    finally:
+        cache_utils._data.max_bytes = bound
+    assert cache_utils.cache_stats()["data"]["oversize"] == 1
@@ -0,0 +1,55 @@
+import os
+import re
+
+import numpy as np
+import pytest
+
+from utils.ctfidf_utils import classify_texts, load_ctfidf_model, stop_word_set, vectorize_texts
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "health", "data", "model_dir")
+
+
+@pytest.fixture(scope="module")
+def model():
+    return load_ctfidf_model(MODEL_DIR)
+
+
+def test_classify_ranks_the_matching_topic_first(model):
+    results = classify_texts(model, [
+        "Tumour immunotherapy with immune checkpoint inhibitors",
+        "A vaccine against malaria for young children",
+    ], top_k=3)
+    best = results[results["rank"] == 1].set_index("doc")["topic_label"]
+    assert best[0].startswith("0-Cancer")
+    assert best[1].startswith("1-Innovative Vaccines")
+    assert (results.groupby("doc")["score"].apply(lambda s: s.is_monotonic_decreasing)).all()
+
+
+def test_empty_text_scores_zero(model):
+    results = classify_texts(model, [""], top_k=2)
+    assert np.allclose(results["score"], 0)
+
+
+@pytest.mark.parametrize("stop_words, strip_accents", [
+    ("english", "unicode"),
+    (["the", "of"], "ascii"),
+    (None, None),
+])
+def test_vectorize_matches_count_vectorizer(stop_words, strip_accents):
+    CountVectorizer = pytest.importorskip("sklearn.feature_extraction.text").CountVectorizer
+    docs = [
+        "The café of the heart disease and the research",
+        "Cancer of the lung is a disease",
+        "résumé of heart research",
+    ]
+    vectorizer = CountVectorizer(stop_words=stop_words, strip_accents=strip_accents, ngram_range=(1, 2)).fit(docs)
+    model = {
+        "vocab": vectorizer.vocabulary_,
+        "token_pattern": re.compile(vectorizer.token_pattern),
+        "lowercase": True,
+        "strip_accents": strip_accents,
+        "stop_words": stop_word_set(stop_words),
+        "ngram_range": (1, 2),
+    }
+    queries = ["THE heart of the café disease résumé research", "lung cancer"]
+    assert (vectorize_texts(model, queries) != vectorizer.transform(queries)).nnz == 0
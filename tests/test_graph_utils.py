@@ -0,0 +1,81 @@
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import cache_utils
+from utils.graph_utils import country_edge_table, country_year_timeline, window_edge_table
+
+COUNTRIES = ["Austria", "Belgium", "France", "Germany", "Italy", "Spain"]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    cache_utils.clear_cache()
+    yield
+    cache_utils.clear_cache()
+
+
+@pytest.fixture
+def orgs():
+    rng = np.random.default_rng(7)
+    rows = []
+    for project in range(120):
+        for _ in range(rng.integers(1, 6)):
+            country = COUNTRIES[rng.integers(len(COUNTRIES))] if rng.random() > 0.05 else None
+            rows.append((project, country))
+    return pd.DataFrame(rows, columns=["projectID", "country_name"])
+
+
+@pytest.fixture
+def project_years():
+    rng = np.random.default_rng(11)
+    years = rng.integers(2014, 2022, size=120).astype(float)
+    years[rng.random(120) < 0.1] = np.nan
+    return pd.DataFrame({"projectID": np.arange(120), "year": years})
+
+
+def baseline_counts(data):
+    """Pair counts as the original build_country_network computed them"""
+    country_edges = []
+    for _, group in data.groupby("projectID"):
+        countries = group["country_name"].dropna().unique()
+        if len(countries) >= 2:
+            country_edges.extend(combinations(sorted(countries), 2))
+    return Counter(country_edges)
+
+
+def table_counts(edges):
+    return Counter({
+        (a, b): n for a, b, n in zip(edges["Country A"], edges["Country B"], edges["Number of Projects"])
+    })
+
+
+def test_edge_table_matches_the_baseline(orgs):
+    edges = country_edge_table(orgs)
+    assert table_counts(edges) == baseline_counts(orgs)
+    assert edges["Number of Projects"].is_monotonic_decreasing
+
+
+@pytest.mark.parametrize("start, end", [(2014, 2021), (2016, 2016), (2015, 2019), (2030, 2031)])
+def test_window_table_matches_the_baseline_over_dated_projects(orgs, project_years, start, end):
+    timeline = country_year_timeline(orgs, project_years)
+    in_window = project_years.loc[project_years["year"].between(start, end), "projectID"]
+    expected = baseline_counts(orgs[orgs["projectID"].isin(in_window)])
+
+    edges = window_edge_table(timeline, start, end)
+    assert table_counts(edges) == expected
+    assert edges["Number of Projects"].is_monotonic_decreasing
+
+
+def test_undated_projects_are_counted_separately(orgs, project_years):
+    timeline = country_year_timeline(orgs, project_years)
+    undated = project_years.loc[project_years["year"].isna(), "projectID"]
+    multi_country = orgs.dropna().groupby("projectID")["country_name"].nunique() >= 2
+    assert timeline["undated"] == int(multi_country[multi_country.index.isin(undated)].sum())
+
+    # The full window plus the undated projects is the all-time table
+    full = table_counts(window_edge_table(timeline, *timeline["years"][[0, -1]]))
+    assert full + baseline_counts(orgs[orgs["projectID"].isin(undated)]) == table_counts(country_edge_table(orgs))
@@ -0,0 +1,66 @@
+import importlib
+import os
+
+import pytest
+
+from pipeline.run import stage_key
+
+
+def run_stage(inputs, outputs, params):
+    pass
+
+
+@pytest.fixture
+def stage(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (tmp_path / "stage_helpers.py").write_text("def helper():\n    return 1\n")
+    (tmp_path / "input.csv").write_text("a,b\n1,2\n")
+    importlib.invalidate_caches()
+    return {
+        "run": run_stage,
+        "code": ["stage_helpers"],
+        "inputs": {"table": str(tmp_path / "input.csv")},
+        "outputs": {},
+    }
+
+
+def rewrite(path, text):
+    # Bump the mtime so the size/mtime digest stamp cannot match the old one
+    stat = os.stat(path)
+    path.write_text(text)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_key_is_stable_when_nothing_changes(stage):
+    assert stage_key("s", stage, {"k": 1}, {}) == stage_key("s", stage, {"k": 1}, {})
+
+
+def test_key_changes_with_params(stage):
+    assert stage_key("s", stage, {"k": 1}, {}) != stage_key("s", stage, {"k": 2}, {})
+
+
+def test_key_changes_with_input_contents(stage, tmp_path):
+    known = {}
+    before = stage_key("s", stage, {}, known)
+    rewrite(tmp_path / "input.csv", "a,b\n1,3\n")
+    assert stage_key("s", stage, {}, known) != before
+
+
+def test_key_changes_with_dependency_source(stage, tmp_path):
+    known = {}
+    before = stage_key("s", stage, {}, known)
+    rewrite(tmp_path / "stage_helpers.py", "def helper():\n    return 2\n")
+    assert stage_key("s", stage, {}, known) != before
+
+
+def test_key_ignores_modules_outside_the_code_list(stage, tmp_path):
+    known = {}
+    before = stage_key("s", stage, {}, known)
+    (tmp_path / "unrelated.py").write_text("VALUE = 1\n")
+    assert stage_key("s", stage, {}, known) == before
+
+
+def test_missing_code_module_is_an_error(stage):
+    stage["code"] = ["no_such_stage_module"]
+    with pytest.raises(ModuleNotFoundError):
+        stage_key("s", stage, {}, {})
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from utils.topic_utils import build_topic_cube, select_topic_totals
+
+
+def topic_frame():
+    """Projects in two labelled topics plus unlabeled outliers (topic -1)"""
+    return pd.DataFrame({
+        "topic": [0, 0, 1, 1, 1, -1, -1],
+        "topic_label": pd.Categorical(["a-Alpha", "a-Alpha", "z-Zeta", "z-Zeta", "z-Zeta", None, None]),
+        "year": pd.array([2020, 2021, 2020, 2020, None, 2020, 2021], dtype="Int16"),
+        "ecMaxContribution": [1.0, 2.0, 3.0, np.nan, 5.0, 100.0, 100.0],
+        "publication_count": [1.0, np.nan, 2.0, 2.0, 2.0, 50.0, 50.0],
+    })
+
+
+def test_cube_keeps_projects_without_a_year():
+    cube = build_topic_cube(topic_frame())
+    zeta = cube[cube["topic"] == 1]
+    assert zeta["count"].sum() == 3
+    assert zeta["year"].isna().sum() == 1
+
+
+def test_totals_exclude_unlabeled_outliers():
+    # "z-Zeta" is the last category: outliers (code -1) must not wrap onto it
+    totals = select_topic_totals(build_topic_cube(topic_frame()), ["z-Zeta"])
+    assert totals["topic"].tolist() == [1]
+    assert totals["count"].tolist() == [3]
+    assert totals["funding_sum"].tolist() == [8.0]
+    assert totals["funding_n"].tolist() == [2]
+    assert totals["publication_sum"].tolist() == [6.0]
+
+
+def test_totals_for_several_topics():
+    totals = select_topic_totals(build_topic_cube(topic_frame()), ["a-Alpha", "z-Zeta"])
+    assert totals["topic_label"].tolist() == ["a-Alpha", "z-Zeta"]
+    assert totals["count"].tolist() == [2, 3]
+    assert totals["publication_n"].tolist() == [1, 3]